@@ -0,0 +1,470 @@
+#!/usr/bin/env python3
+
+"""
+Benchmark library-maint on synthetic ZIM trees of increasing size
+
+pip install unidecode requests lxml zimscraperlib psycopg2-binary
+
+Each tree has categories (folders), titles with several versions, .delete
+markers, hidden folders and sparse (non-exposed) ZIM files. Latest versions
+are copies of a real minimal ZIM (each with its own UUID) so the read path opens
+actual, distinct archives. Those are evicted from the page cache before the first
+readfs so it reads from disk (--hard-links to save space, reading from cache).
+
+Steps are measured in a fresh process per tree size: wall time, read/write calls
+(syscr+syscw from /proc/self/io, not all syscalls) and peak RSS during the step
+(VmHWM, reset before each step). Worker processes are accounted for once reaped:
+their read/write calls are included and the largest worker peak RSS is reported.
+"""
+
+import argparse
+import hashlib
+import importlib.util
+import json
+import logging
+import multiprocessing
+import os
+import pathlib
+import resource
+import shutil
+import struct
+import sys
+import tempfile
+import time
+import uuid
+import zlib
+
+from libzim.writer import (  # pyright: ignore [reportMissingModuleSource]
+    Creator,
+    Hint,
+    Item,
+    StringProvider,
+)
+
+spec = importlib.util.spec_from_file_location(
+    "library_maint", pathlib.Path(__file__).with_name("library-maint.py")
+)
+library_maint = importlib.util.module_from_spec(spec)  # pyright: ignore
+# registered so that --workers can pickle its functions
+sys.modules["library_maint"] = library_maint
+spec.loader.exec_module(library_maint)  # pyright: ignore
+
+logger = logging.getLogger("bench-lib")
+
+LANGS = ("en", "fr", "de", "es", "it", "pt", "ru", "zh", "ar", "hi")
+FLAVOURS = ("all_maxi", "all_nopic", "top_mini", "all_nodet")
+
+
+class MinimalItem(Item):
+    def get_path(self):
+        return "index"
+
+    def get_title(self):
+        return "Benchmark"
+
+    def get_mimetype(self):
+        return "text/html"
+
+    def get_contentprovider(self):
+        return StringProvider("<html><body><p>Benchmark</p></body></html>")
+
+    def get_hints(self):
+        return {Hint.FRONT_ARTICLE: True}
+
+
+def get_png(size: int) -> bytes:
+    """a plain size x size PNG image"""
+
+    def chunk(kind: bytes, data: bytes) -> bytes:
+        return (
+            struct.pack(">I", len(data))
+            + kind
+            + data
+            + struct.pack(">I", zlib.crc32(kind + data))
+        )
+
+    raw = b"".join(b"\0" + b"\x2b\x6e\xbf" * size for _ in range(size))
+    return (
+        b"\x89PNG\r\n\x1a\n"
+        + chunk(b"IHDR", struct.pack(">IIBBBBB", size, size, 8, 2, 0, 0, 0))
+        + chunk(b"IDAT", zlib.compress(raw))
+        + chunk(b"IEND", b"")
+    )
+
+
+def create_minimal_zim(fpath: pathlib.Path):
+    """a real, small ZIM with the metadata library-maint reads"""
+    with Creator(fpath).config_indexing(False, "eng") as creator:
+        creator.set_mainpath("index")
+        creator.add_illustration(48, get_png(48))
+        for name, value in {
+            "Title": "Benchmark",
+            "Description": "Synthetic ZIM for library-maint benchmark",
+            "Language": "eng",
+            "Creator": "Kiwix",
+            "Publisher": "Kiwix",
+            "Name": "benchmark",
+            "Flavour": "maxi",
+            "Tags": "_category:other;_pictures:no",
+            "Date": "2024-01-01",
+        }.items():
+            creator.add_metadata(name, value)
+        creator.add_item(MinimalItem())
+
+
+def copy_minimal_zim(content: bytes, fpath: pathlib.Path):
+    """write a copy of minimal ZIM content to fpath, with a new UUID and checksum"""
+    checksum_pos = struct.unpack_from("<Q", content, 72)[0]
+    data = bytearray(content[:checksum_pos])
+    data[8:24] = uuid.uuid4().bytes
+    with open(fpath, "wb") as fh:
+        fh.write(data)
+        fh.write(hashlib.md5(data).digest())  # noqa: S324
+
+
+def generate_tree(
+    zim_root: pathlib.Path,
+    *,
+    nb_files: int,
+    nb_categories: int,
+    nb_versions: int,
+    delete_ratio: float,
+    hidden_ratio: float,
+    sparse_size: int,
+    minimal_zim: pathlib.Path,
+    hard_links: bool,
+) -> dict[str, int]:
+    """create nb_files ZIM files in zim_root, returning counts per kind
+
+    Latest version of each title is a copy of (or hard link to) minimal_zim,
+    older ones are sparse files of sparse_size. Every 1/delete_ratio older
+    version has a .delete marker and every 1/hidden_ratio title is in a hidden
+    folder"""
+    minimal_content = minimal_zim.read_bytes()
+    counts = {"titles": 0, "real": 0, "sparse": 0, "delete": 0, "hidden": 0}
+    delete_every = int(1 / delete_ratio) if delete_ratio else 0
+    hidden_every = int(1 / hidden_ratio) if hidden_ratio else 0
+    nb_titles = -(-nb_files // nb_versions)
+    nb_created = 0
+    for index in range(nb_titles):
+        category = f"category{index % nb_categories}"
+        is_hidden = hidden_every and index % hidden_every == 0
+        folder = zim_root / (f".{category}" if is_hidden else category)
+        folder.mkdir(parents=True, exist_ok=True)
+        name = (
+            f"{category}_{LANGS[index % len(LANGS)]}_"
+            f"title{index}_{FLAVOURS[index % len(FLAVOURS)]}"
+        )
+        counts["titles"] += 1
+        counts["hidden"] += bool(is_hidden)
+        for version in range(min(nb_versions, nb_files - nb_created)):
+            year, month = divmod(2024 * 12 + 11 - version, 12)
+            fpath = folder / f"{name}_{year}-{month + 1:02d}.zim"
+            if version == 0:
+                if hard_links:
+                    os.link(minimal_zim, fpath)
+                else:
+                    copy_minimal_zim(minimal_content, fpath)
+                counts["real"] += 1
+            else:
+                with open(fpath, "wb") as fh:
+                    fh.truncate(sparse_size)
+                counts["sparse"] += 1
+                if delete_every and nb_created % delete_every == 0:
+                    fpath.with_suffix(".delete").touch()
+                    counts["delete"] += 1
+            nb_created += 1
+    return counts
+
+
+def reset_peak_rss() -> bool:
+    """whether peak RSS (VmHWM) could be reset (linux)"""
+    try:
+        pathlib.Path("/proc/self/clear_refs").write_text("5")
+    except OSError:
+        return False
+    return True
+
+
+def get_peak_rss() -> int:
+    """peak RSS of this process in bytes"""
+    try:
+        for line in pathlib.Path("/proc/self/status").read_text().splitlines():
+            if line.startswith("VmHWM:"):
+                return int(line.split()[1]) * 1024
+    except OSError:
+        ...
+    return resource.getrusage(resource.RUSAGE_SELF).ru_maxrss * 1024
+
+
+def get_workers_peak_rss() -> int:
+    """peak RSS in bytes of the largest reaped child (worker) process"""
+    return resource.getrusage(resource.RUSAGE_CHILDREN).ru_maxrss * 1024
+
+
+def evict_page_cache(fpaths: list[pathlib.Path]) -> bool:
+    """whether fpaths could be evicted from the page cache (once written back)"""
+    if not hasattr(os, "posix_fadvise"):
+        return False
+    os.sync()
+    for fpath in fpaths:
+        try:
+            fd = os.open(fpath, os.O_RDONLY)
+        except OSError:
+            continue
+        try:
+            os.posix_fadvise(fd, 0, 0, os.POSIX_FADV_DONTNEED)
+        finally:
+            os.close(fd)
+    return True
+
+
+def get_rw_calls() -> int:
+    """nb of read and write calls of this process and its reaped children"""
+    try:
+        values = dict(
+            line.split(": ")
+            for line in pathlib.Path("/proc/self/io").read_text().splitlines()
+        )
+    except OSError:
+        return -1
+    return int(values["syscr"]) + int(values["syscw"])
+
+
+class StepsRecorder:
+    def __init__(self):
+        self.results: list[dict] = []
+
+    def measure(self, name: str, func, *args, **kwargs):
+        rss_reset = reset_peak_rss()
+        rw_calls = get_rw_calls()
+        started_on = time.perf_counter()
+        result = func(*args, **kwargs)
+        duration = time.perf_counter() - started_on
+        self.results.append(
+            {
+                "step": name,
+                "duration": duration,
+                "rw_calls": get_rw_calls() - rw_calls if rw_calls >= 0 else -1,
+                "peak_rss": get_peak_rss(),
+                "peak_rss_is_step": rss_reset,
+                "workers_peak_rss": get_workers_peak_rss(),
+            }
+        )
+        logger.info(f"> {name}: {duration:.3f}s")
+        return result
+
+
+def run_suite(workdir: pathlib.Path, options: dict, pipe):
+    """measure library-maint steps on workdir's tree (in a dedicated process)"""
+    zim_root = workdir / "zim"
+    recorder = StepsRecorder()
+
+    zim_files = recorder.measure(
+        "get_zim_files",
+        lambda: list(
+            library_maint.get_zim_files(zim_root, with_hidden=options["with_hidden"])
+        ),
+    )
+    recorder.measure(
+        "sort_filenames_for_recent", library_maint.sort_filenames_for_recent, zim_files
+    )
+
+    args = library_maint.get_parser().parse_args(
+        [
+            "read",
+            "--zim-root",
+            str(zim_root),
+            "--library-dest",
+            str(workdir / "library_zim.xml"),
+            "--internal-library-dest",
+            str(workdir / "internal_library.xml"),
+            "--internal-zim-root",
+            "/data/download/zim",
+            "--redirects-root",
+            str(workdir),
+            "--zim-redirects-map",
+            str(workdir / "zim.map"),
+            "--zim-cache",
+            str(workdir / "zim_cache.sqlite"),
+            "--workers",
+            str(options["workers"]),
+            "--library-compressions",
+            options["library_compressions"],
+            *(["--with-hidden"] if options["with_hidden"] else []),
+        ]
+    )
+    maint = library_maint.LibraryMaintainer(**dict(args._get_kwargs()))
+    maint.load_previous_library()
+    if options["cold_cache"] and not evict_page_cache(zim_files):
+        logger.warning("Unable to evict ZIMs from page cache")
+    recorder.measure("readfs", maint.readfs)
+    maint.all_zims = {}
+    recorder.measure("readfs (cached)", maint.readfs)
+    recorder.measure("write_zim_redirects_map", maint.write_zim_redirects_map)
+    recorder.measure("write_libraries", maint.write_libraries)
+
+    pipe.send(recorder.results)
+    pipe.close()
+
+
+def entrypoint():
+    parser = argparse.ArgumentParser(
+        prog="bench-library-maint",
+        description="Benchmark library-maint on synthetic ZIM trees",
+    )
+    parser.add_argument(
+        "--sizes",
+        help="Comma-separated nb. of ZIM files of each tree. Defaults to 1k,10k,100k",
+        default="1000,10000,100000",
+    )
+    parser.add_argument(
+        "--categories", help="Nb. of category folders", type=int, default=30
+    )
+    parser.add_argument(
+        "--versions", help="Nb. of versions of each title", type=int, default=3
+    )
+    parser.add_argument(
+        "--delete-ratio",
+        help="Ratio of old versions with a .delete marker",
+        type=float,
+        default=0.1,
+    )
+    parser.add_argument(
+        "--hidden-ratio",
+        help="Ratio of titles in hidden folders",
+        type=float,
+        default=0.05,
+    )
+    parser.add_argument(
+        "--with-hidden",
+        help="Include hidden folders (as library-maint --with-hidden)",
+        action="store_true",
+        default=False,
+    )
+    parser.add_argument(
+        "--sparse-size",
+        help="Size (bytes) of sparse, non-latest ZIM files",
+        type=int,
+        default=2**30,
+    )
+    parser.add_argument(
+        "--hard-links",
+        help="Hard link latest versions to a single ZIM instead of copying it "
+        "(saves space but readfs then reads from page cache)",
+        action="store_true",
+        default=False,
+    )
+    parser.add_argument(
+        "--warm-cache",
+        help="Don't evict ZIM files from page cache before readfs",
+        action="store_true",
+        default=False,
+    )
+    parser.add_argument(
+        "--workers", help="library-maint --workers", type=int, default=1
+    )
+    parser.add_argument(
+        "--library-compressions",
+        help="library-maint --library-compressions",
+        default="",
+    )
+    parser.add_argument(
+        "--workdir",
+        help="Folder to create trees in. Defaults to a temporary folder",
+        default="",
+    )
+    parser.add_argument(
+        "--keep", help="Keep trees once measured", action="store_true", default=False
+    )
+    parser.add_argument("--json", help="Path to write results to, as JSON", default="")
+    parser.add_argument(
+        "--debug", help="Log library-maint output", action="store_true", default=False
+    )
+    args = parser.parse_args()
+
+    logging.basicConfig(level=logging.INFO, format="%(asctime)s %(message)s")
+    library_maint.logger.setLevel(logging.DEBUG if args.debug else logging.WARNING)
+
+    workroot = pathlib.Path(args.workdir or tempfile.mkdtemp(prefix="bench-lib-"))
+    workroot.mkdir(parents=True, exist_ok=True)
+    minimal_zim = workroot / "minimal.zim"
+    create_minimal_zim(minimal_zim)
+
+    results = []
+    for size in [int(size) for size in args.sizes.split(",")]:
+        workdir = workroot / f"tree-{size}"
+        shutil.rmtree(workdir, ignore_errors=True)
+        logger.info(f"Generating tree of {size} ZIM files in {workdir}")
+        counts = generate_tree(
+            workdir / "zim",
+            nb_files=size,
+            nb_categories=args.categories,
+            nb_versions=args.versions,
+            delete_ratio=args.delete_ratio,
+            hidden_ratio=args.hidden_ratio,
+            sparse_size=args.sparse_size,
+            minimal_zim=minimal_zim,
+            hard_links=args.hard_links,
+        )
+        logger.info(f"> {counts}")
+
+        # fresh process so peak RSS and counters are per tree (fork inherits module)
+        receiver, sender = multiprocessing.Pipe(duplex=False)
+        process = multiprocessing.get_context("fork").Process(
+            target=run_suite,
+            args=(
+                workdir,
+                {
+                    "with_hidden": args.with_hidden,
+                    "workers": args.workers,
+                    "cold_cache": not (args.warm_cache or args.hard_links),
+                    "library_compressions": args.library_compressions,
+                },
+                sender,
+            ),
+        )
+        process.start()
+        sender.close()
+        try:
+            steps = receiver.recv()
+        except EOFError:
+            steps = []
+        process.join()
+        if process.exitcode:
+            logger.error(f"Benchmark failed for {size} files")
+            return 1
+        results.append({"size": size, "tree": counts, "steps": steps})
+
+        if not args.keep:
+            shutil.rmtree(workdir, ignore_errors=True)
+
+    if not args.keep and not args.workdir:
+        shutil.rmtree(workroot, ignore_errors=True)
+
+    if args.hard_links:
+        cache_note = "latest ZIMs are hard links to a single file (page cache)"
+    elif args.warm_cache:
+        cache_note = "latest ZIMs are distinct files, read from page cache"
+    else:
+        cache_note = "latest ZIMs are distinct files, evicted from page cache"
+    print(f"readfs: {cache_note}")  # noqa: T201
+    print(  # noqa: T201
+        f"{'files':>8} {'step':<26} {'wall (s)':>10} {'read/write calls':>17} "
+        f"{'peak RSS (MiB)':>15} {'workers peak RSS (MiB)':>23}"
+    )
+    for result in results:
+        for step in result["steps"]:
+            print(  # noqa: T201
+                f"{result['size']:>8} {step['step']:<26} {step['duration']:>10.3f} "
+                f"{step['rw_calls']:>17} {step['peak_rss'] / 2**20:>15.1f} "
+                f"{step['workers_peak_rss'] / 2**20:>23.1f}"
+            )
+
+    if args.json:
+        with open(args.json, "w") as fh:
+            json.dump(results, fh, indent=4)
+
+
+if __name__ == "__main__":
+    sys.exit(entrypoint())
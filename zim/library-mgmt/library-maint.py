@@ -3,21 +3,39 @@
 """
 apt install -y libmagic1
 pip install unidecode requests lxml zimscraperlib psycopg2-binary
+pip install brotli zstandard  # optional, for .br and .zst library variants
 """
 
 import argparse
 import base64
+import concurrent.futures
+import ctypes
+import ctypes.util
 import datetime
+import functools
+import hashlib
+import io
 import json
 import logging
+import lzma
+import mmap
 import os
 import pathlib
+import platform
 import re
+import resource
+import select
+import shutil
+import sqlite3
+import struct
 import sys
+import threading
 import time
 import urllib.parse
+import uuid
+import zlib
 from collections.abc import Generator, Iterable
-from contextlib import contextmanager
+from contextlib import ExitStack, contextmanager
 from dataclasses import dataclass
 from typing import Any
 
@@ -27,12 +45,58 @@ import requests
 import unidecode
 from humanfriendly import format_size as human_size
 from lxml import etree  # pyright: ignore [reportAttributeAccessIssue]
+from zimscraperlib.i18n import find_language_names, get_language_details
 from zimscraperlib.zim import Archive
+from zimscraperlib.zim._libkiwix import convertTags, parseMimetypeCounter
+
+try:
+    import brotli  # pyright: ignore [reportMissingImports]
+except ImportError:
+    brotli = None
+try:
+    import zstandard  # pyright: ignore [reportMissingImports]
+except ImportError:
+    zstandard = None
 
 MIRRORBRAIN_DB_DSN = os.getenv("MIRRORBRAIN_DB_DSN") or "notset"
 MIRRORBRAIN_BATCH_SIZE = int(os.getenv("MIRRORBRAIN_BATCH_SIZE") or "100")
+# single COPY+JOIN query instead of batches of MIRRORBRAIN_BATCH_SIZE ANY() queries
+MIRRORBRAIN_BULK_QUERY = (os.getenv("MIRRORBRAIN_BULK_QUERY") or "1") == "1"
 
 VARNISH_PURGE_HTTP_TIMEOUT = 50
+# seconds to let backends pick up the new library before purging
+VARNISH_PURGE_DELAY = 10
+
+# compressed variants of XML libraries (for nginx *_static) and their modules
+LIBRARY_COMPRESSION_MODULES = {"gz": zlib, "br": brotli, "zst": zstandard}
+GZIP_LEVEL = 9
+BROTLI_QUALITY = 9
+ZSTD_LEVEL = 15
+
+# kinds of Internal Library shards (sub-libraries) and their manifest
+LIBRARY_SHARD_KINDS = ("category", "lang", "project")
+LIBRARY_SHARDS_MANIFEST = "manifest.json"
+
+# XML Library index sidecar (<library>.idx). bump version on layout changes
+LIBRARY_INDEX_MAGIC = b"LMLIBIDX"
+LIBRARY_INDEX_VERSION = 2
+# header: version, nb. of slots, size and SHA256 digest of the indexed library
+LIBRARY_INDEX_HEADER = struct.Struct("<HIQ32s")
+# slot: key hash, book offset and length (0 for empty slot)
+LIBRARY_INDEX_SLOT = struct.Struct("<IQI")
+
+# OPDS v2 (as served by kiwix-serve under /catalog/v2) namespaces and mimetypes
+OPDS_NSMAP = {
+    None: "http://www.w3.org/2005/Atom",
+    "dc": "http://purl.org/dc/terms/",
+    "opds": "https://specs.opds.io/opds-1.2",
+    "thr": "http://purl.org/syndication/thread/1.0",
+}
+OPDS_ACQUISITION_MIMETYPE = "application/atom+xml;profile=opds-catalog;kind=acquisition"
+OPDS_NAVIGATION_MIMETYPE = "application/atom+xml;profile=opds-catalog;kind=navigation"
+
+# bump whenever the in-ZIM info we extract changes so cached values are discarded
+ZIM_CACHE_VERSION = 1
 
 
 # in-ZIM metadata to in-library XML attributes
@@ -48,6 +112,86 @@ NAMES_MAP: dict[str, str] = {
     "Date": "date",
 }
 
+# in-ZIM info (as read by read_zim_metadata) in entries
+ZIM_INFO_KEYS = [
+    "id",
+    "mediaCount",
+    "articleCount",
+    *list(NAMES_MAP.values()),
+    "favicon",
+]
+
+# ZimEntry fields with few distinct values, interned to share a single copy
+INTERNED_KEYS = (
+    "project",
+    "lang",
+    "option",
+    "month",
+    "year",
+    "language",
+    "creator",
+    "publisher",
+    "flavour",
+)
+
+# current filename format for ZIMs (period is YYYY-MM)
+ZIM_FILENAME_FMT = re.compile(
+    r"^(?P<project>.+?_)(?P<lang>[a-z\-]{2,10}?_|)"
+    r"(?P<option>.+_|)(?P<year>[\d]{4}|)\-(?P<month>[\d]{2})$",
+    re.IGNORECASE,
+)
+# former (old) filename format for ZIMs (period was MM_YYYY)
+OLD_ZIM_FILENAME_FMT = re.compile(
+    r"^(?P<project>.+?_)(?P<lang>[a-z\-]{2,10}?_|)"
+    r"(?P<option>.+_|)(?P<month>[\d]{2}|)_(?P<year>[\d]{4})$",
+    re.IGNORECASE,
+)
+ZIM_PERIOD_SUFFIX = re.compile(r"_(?P<period>\d{4}-\d{2})$")
+
+# binary --dump-fs snapshot. bump version on layout changes (not on fields changes)
+FS_SNAPSHOT_MAGIC = b"LMFSSNAP"
+FS_SNAPSHOT_VERSION = 1
+# entries fields and their types.
+# s: str, p: path, q: int, ?: bool, b: base64 str (stored decoded)
+FS_SNAPSHOT_FIELDS = [
+    ("project", "s"),
+    ("lang", "s"),
+    ("option", "s"),
+    ("month", "s"),
+    ("year", "s"),
+    ("core", "s"),
+    ("rsize", "q"),
+    ("mtime_ns", "q"),
+    ("relpath", "p"),
+    ("size", "s"),
+    ("url", "s"),
+    ("latest", "?"),
+    *[(key, "b" if key == "favicon" else "s") for key in ZIM_INFO_KEYS],
+]
+
+# run counters exported by RunMetrics (all per run) and their description
+RUN_METRICS = {
+    "zims": "ZIM files in all_zims",
+    "aliases": "ZIM aliases in all_zims",
+    "zims_opened": "ZIM archives opened to read in-ZIM info",
+    "zims_cached": "ZIM entries with in-ZIM info from zim_cache",
+    "zims_from_snapshot": "ZIM entries with in-ZIM info from revalidated load_fs",
+    "zims_not_mirrorbrain_ready": "ZIM files excluded as not ready on Mirrorbrain",
+    "zims_deleted": "obsolete ZIM files deleted (or moved to trash)",
+    "trash_reclaimed_files": "files removed from ZIM trash",
+    "trash_reclaimed_bytes": "bytes reclaimed from ZIM trash",
+    "redirects": "redirects written to ZIM redirects map",
+    "library_books": "books in the Public Library",
+    "library_bytes": "size of the Public Library",
+    "library_shards": "Internal Library shards written",
+    "opds_documents": "static OPDS catalog documents written",
+    "journal_events": "Library changes appended to library journal",
+    "purge_requests": "PURGE requests sent to Varnish",
+    "purge_errors": "PURGE requests that failed",
+    "purge_latency_seconds_sum": "total latency of PURGE requests",
+    "purge_latency_seconds_max": "highest latency of a PURGE request",
+}
+
 COPIED_KEYS = [
     "id",
     "size",
@@ -117,57 +261,225 @@ class Mirrorbrain:
         We cant make an enormous query with an IN/ANY parameter containing
         4,000 items neither.
 
-        We're left with two choices:
+        We're left with three choices:
         - make 4K individual requests
           - quick requests as those match on equality of path
           - output is only a boolean for each
         - make batch requests with ANY operator
           - way less requests (40 for batches of 100)
           - output is a lot more verbose as we then need the path for each
+        - COPY all paths into a temporary table and JOIN it (bulk, default)
+          - single round-trip, single query
+          - output is the list of paths with hashes
+
+        Bulk mode is used unless MIRRORBRAIN_BULK_QUERY is not `1`
         """
 
         if not all_zims:
             return []
 
-        nb_zims = len(all_zims)
-        batch_size = MIRRORBRAIN_BATCH_SIZE
-        nb_batches = nb_zims // batch_size
-        remaining = nb_zims % batch_size
-        missing = list(all_zims)
-
-        def get_prefix(zim_path: pathlib.Path) -> pathlib.Path:
-            relpath = zim_path.relative_to(relative_to)
-            return pathlib.Path(*zim_path.parts[: -len(relpath.parts)])
+        relpaths = {
+            zim_path: str(zim_path.relative_to(relative_to)) for zim_path in all_zims
+        }
+        if MIRRORBRAIN_BULK_QUERY:
+            hashed = cls.get_hashed_from(list(relpaths.values()))
+        else:
+            hashed = cls.get_hashed_from_batches(list(relpaths.values()))
+        return [zim_path for zim_path in all_zims if relpaths[zim_path] not in hashed]
 
-        # record the source values prefix so we can apply that back when we receive
-        # the results from MB DB as those are relative to MB root (so no prefix)
-        prefix = get_prefix(all_zims[0])
+    @classmethod
+    def get_hashed_from(cls, relpaths: list[str]) -> set[str]:
+        """relpaths from supplied list that have hashes on mirrorbrain (bulk)"""
+
+        def copy_escape(text: str) -> str:
+            """text escaped for COPY's text format"""
+            for char, escaped in (
+                ("\\", "\\\\"),
+                ("\n", "\\n"),
+                ("\r", "\\r"),
+                ("\t", "\\t"),
+            ):
+                text = text.replace(char, escaped)
+            return text
 
-        def query_for(zim_paths: list[pathlib.Path]):
-            if not zim_paths:
-                return
-            stmt = (
-                r"SELECT f.path FROM filearr f, hash h "
-                r"WHERE f.id=h.file_id and f.path = ANY(%s);"
-            )
-            values = [str(zim_path.relative_to(relative_to)) for zim_path in zim_paths]
-            cursor.execute(stmt, (values,))
-            for row in cursor.fetchall():
-                zim_path = prefix.joinpath(pathlib.Path(row[0]))
-                missing.remove(zim_path)
+        with cls.get_connection() as connection:
+            with connection.cursor() as cursor:
+                cursor.execute(
+                    r"CREATE TEMPORARY TABLE candidates (path text NOT NULL) "
+                    r"ON COMMIT DROP;"
+                )
+                cursor.copy_expert(
+                    r"COPY candidates (path) FROM STDIN;",
+                    io.StringIO(
+                        "".join(f"{copy_escape(relpath)}\n" for relpath in relpaths)
+                    ),
+                )
+                cursor.execute(
+                    r"SELECT DISTINCT c.path FROM candidates c "
+                    r"JOIN filearr f ON f.path = c.path "
+                    r"JOIN hash h ON h.file_id = f.id;"
+                )
+                return {row[0] for row in cursor.fetchall()}
 
+    @classmethod
+    def get_hashed_from_batches(cls, relpaths: list[str]) -> set[str]:
+        """relpaths from supplied list that have hashes on mirrorbrain (batches)"""
+        hashed = set()
         with cls.get_connection() as connection:
             with connection.cursor() as cursor:
-                for batch_index in range(nb_batches):
-                    query_for(
-                        all_zims[
-                            (batch_index * batch_size) : (batch_index * batch_size)
-                            + batch_size
-                        ]
+                for index in range(0, len(relpaths), MIRRORBRAIN_BATCH_SIZE):
+                    cursor.execute(
+                        r"SELECT f.path FROM filearr f, hash h "
+                        r"WHERE f.id=h.file_id and f.path = ANY(%s);",
+                        (relpaths[index : index + MIRRORBRAIN_BATCH_SIZE],),
                     )
-                if remaining:
-                    query_for(all_zims[-remaining:])
-        return missing
+                    hashed.update(row[0] for row in cursor.fetchall())
+        return hashed
+
+
+@dataclass
+class PurgeResult:
+    varnish_url: str
+    purge_type: str
+    target: str
+    duration: float = 0.0
+    status: int | None = None
+    error: str = ""
+    aliases: tuple[str, ...] = ()  # of purged books
+
+
+class VarnishPurger:
+    """Dispatches PURGE requests to Varnish instances
+
+    - a keep-alive Session (pooled connections) per Varnish instance
+    - requests are sent concurrently, at most `concurrency` at once
+    - books are purged one by one (`book` type) or, if batch_size is above 1,
+      in groups of batch_size books (`books` type, |-separated header values)
+    - latency and outcome of each request is recorded in `results`"""
+
+    def __init__(self, varnish_urls: list[str], *, concurrency: int, batch_size: int):
+        self.varnish_urls = varnish_urls
+        self.concurrency = max(concurrency, 1)
+        self.batch_size = batch_size
+        self.results: list[PurgeResult] = []
+        self.sessions: dict[str, requests.Session] = {}
+        for varnish_url in self.varnish_urls:
+            session = requests.Session()
+            adapter = requests.adapters.HTTPAdapter(
+                pool_connections=1, pool_maxsize=self.concurrency
+            )
+            session.mount("http://", adapter)
+            session.mount("https://", adapter)
+            self.sessions[varnish_url] = session
+
+    def purge(
+        self,
+        varnish_url: str,
+        purge_type: str,
+        target: str,
+        headers: dict[str, str],
+        aliases: tuple[str, ...] = (),
+    ) -> PurgeResult:
+        """send a single PURGE request, recording its outcome"""
+        result = PurgeResult(
+            varnish_url=varnish_url,
+            purge_type=purge_type,
+            target=target,
+            aliases=aliases,
+        )
+        started_on = time.monotonic()
+        try:
+            resp = self.sessions[varnish_url].request(
+                method="PURGE",
+                url=varnish_url,
+                headers={"X-Purge-Type": purge_type, **headers},
+                timeout=VARNISH_PURGE_HTTP_TIMEOUT,
+            )
+            result.status = resp.status_code
+            if not resp.ok:
+                result.error = f"HTTP {resp.status_code}/{resp.reason}"
+        except requests.RequestException as exc:
+            result.error = str(exc)
+        result.duration = time.monotonic() - started_on
+
+        if result.error:
+            logger.error(f"[PURGE] > {varnish_url} {target}: {result.error}")
+        else:
+            logger.debug(
+                f"[PURGE] > {varnish_url} {target}: HTTP {result.status} "
+                f"in {result.duration:.3f}s"
+            )
+        return result
+
+    def dispatch(self, purges: list[tuple]):
+        """send (varnish_url, purge_type, target, headers[, aliases]) purges
+        concurrently"""
+        with concurrent.futures.ThreadPoolExecutor(
+            max_workers=self.concurrency
+        ) as executor:
+            self.results += list(executor.map(lambda args: self.purge(*args), purges))
+
+    def purge_library(self):
+        self.dispatch([(url, "library", "library", {}) for url in self.varnish_urls])
+
+    def purge_books(self, books: dict[str, tuple[str, str]]):
+        """purge books from all instances. books is alias: (uuid, core)"""
+        items = list(books.items())
+        purges = []
+        if self.batch_size > 1:
+            for index in range(0, len(items), self.batch_size):
+                batch = items[index : index + self.batch_size]
+                headers = {
+                    "X-Book-Id": "|".join(book_id for _, (book_id, _) in batch),
+                    "X-Book-Name": "|".join(book_core for _, (_, book_core) in batch),
+                    # only account for new-style book name fmt (yolo)
+                    "X-Book-Name-Nodate": "|".join(
+                        book_alias for book_alias, _ in batch
+                    ),
+                }
+                target = f"{len(batch)} books from {batch[0][0]}"
+                aliases = tuple(book_alias for book_alias, _ in batch)
+                purges += [
+                    (url, "books", target, headers, aliases)
+                    for url in self.varnish_urls
+                ]
+        else:
+            for book_alias, (book_id, book_core) in items:
+                headers = {
+                    "X-Book-Id": book_id,
+                    "X-Book-Name": book_core,
+                    # only account for new-style book name fmt (yolo)
+                    "X-Book-Name-Nodate": book_alias,
+                }
+                target = f"{book_alias} / {book_core} / {book_id}"
+                purges += [
+                    (url, "book", target, headers, (book_alias,))
+                    for url in self.varnish_urls
+                ]
+        self.dispatch(purges)
+
+    @property
+    def failed(self) -> list[PurgeResult]:
+        return [res for res in self.results if res.error]
+
+    def log_summary(self):
+        for varnish_url in self.varnish_urls:
+            results = [res for res in self.results if res.varnish_url == varnish_url]
+            if not results:
+                continue
+            durations = sorted(res.duration for res in results)
+            logger.info(
+                f"[PURGE] {varnish_url}: {len(results)} requests, "
+                f"{len([res for res in results if res.error])} errors. Latency "
+                f"min={durations[0]:.3f}s "
+                f"median={durations[len(durations) // 2]:.3f}s "
+                f"max={durations[-1]:.3f}s "
+                f"total={sum(durations):.3f}s"
+            )
+
+    def close(self):
+        for session in self.sessions.values():
+            session.close()
 
 
 @dataclass
@@ -188,13 +500,27 @@ class Defaults:
     NB_ZIM_VERSIONS_EXPOSED = 1
 
     VARNISH_URLS = ["http://localhost"]
+    VARNISH_PURGE_CONCURRENCY = 8
+    VARNISH_PURGE_BATCH_SIZE = 0
+
+    LIBRARY_COMPRESSIONS = ""
+
+    WATCH_DEBOUNCE = 5
+    WATCH_RESCAN_INTERVAL = 6 * 3600
+
+    OPDS_PAGE_SIZE = 10
+
+    TRASH_RECLAIM_RATE = 256 * 2**20
+    TRASH_TRUNCATE_STEP = 2**30
+
+    LIBRARY_JOURNAL_MAX_SIZE = 16 * 2**20
+    LIBRARY_JOURNAL_KEEP = 8
 
 
-def pathlib_relpath(data: Any) -> Any:
-    """json.load hook to cast `relpath` attribute"""
-    if isinstance(data, dict):
-        if "relpath" in data:
-            data["relpath"] = pathlib.Path(data["relpath"])
+def zim_entry_hook(data: Any) -> Any:
+    """json.load hook to cast entries (with a `relpath` attribute) to ZimEntry"""
+    if isinstance(data, dict) and "relpath" in data:
+        return ZimEntry.from_dict(data)
 
     return data
 
@@ -211,32 +537,68 @@ def swap(tmp: pathlib.Path, final: pathlib.Path):
     tmp.rename(final)
 
 
-def without_period(text: str) -> str:
-    """text or filename without its ending _YYYY-MM period suffix"""
-    return re.sub(r"_\d{4}-\d{2}$", "", re.sub(r"\.zim$", "", text))
+def fname_from_url(url: str) -> pathlib.Path:
+    return pathlib.Path(urllib.parse.urlparse(re.sub(r".meta4$", "", url)).path)
 
 
-def period_from(text: str) -> str:
-    """extracted period from a ZIM filename or stem"""
-    return re.search(
-        r"_(?P<period>\d{4}-\d{2})$", re.sub(r"\.zim$", "", text)
-    ).groupdict()[  # pyright: ignore [reportOptionalMemberAccess]
-        "period"
-    ]
+@dataclass(frozen=True, slots=True)
+class ZimFilename:
+    """A ZIM filename (stem) parsed once: see parse_zim_filename()
 
+    Filename-format parts are empty if the name is non-standard (not matching
+    ZIM_FILENAME_FMT nor OLD_ZIM_FILENAME_FMT), period if it has no YYYY-MM"""
 
-def fname_from_url(url: str) -> pathlib.Path:
-    return pathlib.Path(urllib.parse.urlparse(re.sub(r".meta4$", "", url)).path)
+    core: str
+    name: str  # without period
+    period: str
+    standard: bool
+    project: str
+    lang: str
+    option: str
+    year: str
+    month: str
+    human_id: str
+    alias: str
+
+    @property
+    def sort_key(self) -> tuple[str, int]:
+        """ASC name but DESC period (see sort_filenames_for_recent)"""
+        return self.name, -int(self.period.replace("-", ""))
+
+
+@functools.lru_cache(maxsize=2**16)
+def parse_zim_filename(stem: str) -> ZimFilename:
+    """ZimFilename for a ZIM filename stem, cached as parsed many times per run"""
+    values = None
+    for fmt in (ZIM_FILENAME_FMT, OLD_ZIM_FILENAME_FMT):
+        if match := fmt.match(stem):
+            values = match.groupdict()
+            break
+    period = ZIM_PERIOD_SUFFIX.search(stem)
+    human_id = unidecode.unidecode(stem.replace(" ", "_").replace("+", "plus"))
+    return ZimFilename(
+        core=stem,
+        name=ZIM_PERIOD_SUFFIX.sub("", stem),
+        period=period.group("period") if period else "",
+        standard=values is not None,
+        project=values["project"][:-1] if values else "",
+        lang=(values["lang"][:-1] or "en") if values else "",
+        option=values["option"][:-1] if values else "",
+        year=values["year"] if values else "",
+        month=values["month"] if values else "",
+        human_id=human_id,
+        alias=ZIM_PERIOD_SUFFIX.sub("", human_id),
+    )
 
 
 def to_human_id(fpath: pathlib.Path) -> str:
     """libkiwix-compat human ID (used in path-prefix) for a ZIM file"""
-    return unidecode.unidecode(fpath.stem.replace(" ", "_").replace("+", "plus"))
+    return parse_zim_filename(fpath.stem).human_id
 
 
 def to_human_alias(fpath: pathlib.Path) -> str:
     """libkiwix --nodatealias equivalent from ZIM filename"""
-    return without_period(to_human_id(fpath))
+    return parse_zim_filename(fpath.stem).alias
 
 
 def to_core(fpath: pathlib.Path) -> str:
@@ -244,48 +606,136 @@ def to_core(fpath: pathlib.Path) -> str:
     return fpath.stem
 
 
+@dataclass(slots=True)
+class ZimEntry:
+    """A ZIM file in all_zims: filename-based info then in-ZIM info once read
+
+    Slotted, with interned low-cardinality strings and a raw favicon, as there
+    is one per ZIM file in the tree. Dict-like `get()` for COPIED_KEYS."""
+
+    project: str
+    lang: str
+    option: str
+    month: str
+    year: str
+    core: str
+    rsize: int
+    relpath: pathlib.Path
+    url: str
+    latest: bool
+    # in-ZIM info (see ZIM_INFO_KEYS). id is empty until read
+    id: str = ""
+    mediaCount: str = ""  # noqa: N815
+    articleCount: str = ""  # noqa: N815
+    title: str = ""
+    description: str = ""
+    language: str = ""
+    creator: str = ""
+    publisher: str = ""
+    name: str = ""
+    flavour: str = ""
+    tags: str = ""
+    date: str = ""
+    favicon: bytes = b""
+
+    def __post_init__(self):
+        for key in INTERNED_KEYS:
+            setattr(self, key, sys.intern(getattr(self, key)))
+
+    @property
+    def size(self) -> str:
+        """size in KiB, as in XML Library"""
+        return str(int(self.rsize / 1024))
+
+    def get(self, key: str, default: Any = "") -> Any:
+        """value for key as in XML Library (base64 favicon)"""
+        if key == "favicon":
+            return base64.standard_b64encode(self.favicon).decode("ASCII")
+        return getattr(self, key, default)
+
+    def update(self, info: dict[str, str]):
+        """set in-ZIM info (as read by read_zim_metadata)"""
+        for key, value in info.items():
+            if key == "favicon":
+                self.favicon = base64.standard_b64decode(value)
+            elif key in INTERNED_KEYS:
+                setattr(self, key, sys.intern(value))
+            else:
+                setattr(self, key, value)
+
+    def info(self) -> dict[str, str]:
+        """in-ZIM info, as read by read_zim_metadata"""
+        return {key: self.get(key) for key in ZIM_INFO_KEYS if getattr(self, key)}
+
+    def to_dict(self) -> dict[str, Any]:
+        """all info as a plain dict (JSON and snapshots)"""
+        return {
+            "project": self.project,
+            "lang": self.lang,
+            "option": self.option,
+            "month": self.month,
+            "year": self.year,
+            "core": self.core,
+            "rsize": self.rsize,
+            "relpath": self.relpath,
+            "size": self.size,
+            "url": self.url,
+            "latest": self.latest,
+            **self.info(),
+        }
+
+    @classmethod
+    def from_dict(cls, data: dict[str, Any]) -> "ZimEntry":
+        """ZimEntry from a to_dict() output (`size` is ignored)"""
+        entry = cls(
+            project=data["project"],
+            lang=data["lang"],
+            option=data["option"],
+            month=data["month"],
+            year=data["year"],
+            core=data["core"],
+            rsize=int(data["rsize"]),
+            relpath=pathlib.Path(data["relpath"]),
+            url=data["url"],
+            latest=data["latest"],
+        )
+        entry.update({key: data[key] for key in ZIM_INFO_KEYS if data.get(key)})
+        return entry
+
+
 def to_std_dict(obj: Any) -> dict:
     """Specific values we use to compare previous/current libraries"""
     return {key: obj.get(key, "") for key in COPIED_KEYS}
 
 
-def human_sort(entry: dict) -> str:
+def to_std_fingerprint(obj: Any) -> bytes:
+    """Fixed-size digest of to_std_dict values, to compare previous/current books"""
+    return hashlib.blake2b(
+        "\0".join(str(value) for value in to_std_dict(obj).values()).encode("UTF-8"),
+        digest_size=16,
+    ).digest()
+
+
+def human_sort(entry: ZimEntry) -> str:
     """human-sort-frienldy string to compare ZIM entries"""
     return (
-        str(PROJECTS_PRIO.get(entry["project"], len(PROJECTS_PRIO) + 1)).zfill(2)
-        + entry["lang"]
-        + entry["year"]
-        + entry["month"]
+        str(PROJECTS_PRIO.get(entry.project, len(PROJECTS_PRIO) + 1)).zfill(2)
+        + entry.lang
+        + entry.year
+        + entry.month
     )
 
 
 def sort_filenames_for_recent(filenames: Iterable[pathlib.Path]) -> list[pathlib.Path]:
     """Sorted copy of a list of ZIM filenames with ASC names but DESC periods"""
 
-    def split_filename(filename):
-        return re.split(r"_(?P<period>\d{4}-\d{2})$", filename.stem)
+    def get_sort_key(filename):
+        parsed = parse_zim_filename(filename.stem)
+        if not parsed.period:
+            raise ValueError(f"No period in ZIM filename {filename}")
+        return parsed.sort_key
 
-    def get_core(filename):
-        try:
-            return split_filename(filename)[0]
-        except IndexError:
-            print(f"FAILED on {filename}")  # noqa: T201
-            raise
-
-    def get_period(filename):
-        try:
-            return split_filename(filename)[1]
-        except IndexError:
-            print(f"FAILED on {filename}")  # noqa: T201
-            raise
-
-    filenames_ = list(filenames)
-    # sort by descending period
-    filenames_.sort(key=get_period, reverse=True)
-    # sort by core
-    filenames_.sort(key=get_core, reverse=False)
-
-    return filenames_
+    return sorted(filenames, key=get_sort_key)
 
 
 @contextmanager
@@ -297,146 +747,1533 @@ def open_chmod(file: pathlib.Path, *args, **kwargs):
         file.chmod(chmod)
 
 
+def get_st_dev(path: pathlib.Path) -> int:
+    """device of path's filesystem (of its closest existing parent if missing)"""
+    for parent in (path, *path.absolute().parents):
+        try:
+            return parent.stat().st_dev
+        except FileNotFoundError:
+            continue
+    raise FileNotFoundError(path)
+
+
+def is_excluded_name(name: str) -> bool:
+    """whether a file or folder name is excluded from walks (special or hidden)"""
+    return name.startswith("speedtest_") or name.startswith(".")
+
+
 def get_zim_files(
     root: pathlib.Path, *, with_hidden: bool = False
 ) -> Generator[pathlib.Path, None, None]:
     """ZIM (*.zim) file paths from a root folder, recursively.
 
-    Optionnaly includes ZIM files in hidden folders (not hidden ZIMs!)"""
+    Optionnaly includes ZIM files in hidden folders (not hidden ZIMs!)
 
-    def excluded_filter(fp: pathlib.Path) -> bool:
-        """excludes files not to consider
+    Each folder is read once (scandir) and excluded folders are not walked into.
+    Excluded are:
+    - special patterns (speedtest_ prefix)
+    - hidden files (and folders unless with_hidden)
+    - files marked for deletion with .delete suffix (sibling file)"""
 
-        - special patterns
-        - hidden files
-        - files marked for deletion with .delete suffix
-        """
-        return (
-            not fp.name.startswith("speedtest_")
-            and (not fp.name.startswith(".") or fp.name == ".")
-            and (len(fp.name) == 0 or not fp.with_suffix(".delete").exists())
-        )
+    def walk(folder: str) -> Generator[pathlib.Path, None, None]:
+        try:
+            with os.scandir(folder) as it:
+                entries = list(it)
+        except PermissionError:
+            return
 
-    if with_hidden:  # faster than os.walk in this case
-        filter_ = excluded_filter
-    else:
+        delete_markers = {
+            entry.name for entry in entries if entry.name.endswith(".delete")
+        }
+        subfolders = []
+        for entry in entries:
+            if entry.is_dir(follow_symlinks=False):
+                if with_hidden or not is_excluded_name(entry.name):
+                    subfolders.append(entry.path)
+                continue
+            if (
+                entry.name.endswith(".zim")
+                and not is_excluded_name(entry.name)
+                and f"{entry.name[:-4]}.delete" not in delete_markers
+                and not entry.is_dir()
+            ):
+                yield pathlib.Path(entry.path)
 
-        def filter_(fp: pathlib.Path) -> bool:
-            return all(
-                [excluded_filter(parent) for parent in fp.relative_to(root).parents]
-                + [excluded_filter(fp)]
-            )
+        for subfolder in subfolders:
+            yield from walk(subfolder)
 
-    yield from filter(filter_, root.rglob("*.zim"))
+    yield from walk(str(root))
 
 
-def is_latest(fpath: pathlib.Path) -> bool:
-    """whether latest version of a Title, based on filename"""
-    version = period_from(fpath.stem)
-    for filename in fpath.parent.glob(f"{without_period(fpath.stem)}_*.zim"):
-        if period_from(filename.name) > version:
-            return False
-    return True
+def get_fs_fingerprint(root: pathlib.Path, *, with_hidden: bool = False) -> str:
+    """Aggregated fingerprint of folders under root (as walked by get_zim_files)
+
+    Based on each folder's path, mtime and number of entries: adding,
+    removing or renaming a file (or .delete marker) changes its folder's mtime.
+    Files modified in-place are not detected."""
+
+    digest = hashlib.sha256()
 
+    def walk(folder: str, stat: os.stat_result):
+        try:
+            with os.scandir(folder) as it:
+                entries = list(it)
+        except PermissionError:
+            return
+        digest.update(f"{folder}\0{stat.st_mtime_ns}\0{len(entries)}\n".encode())
+        for entry in entries:
+            if not entry.is_dir(follow_symlinks=False):
+                continue
+            if not with_hidden and is_excluded_name(entry.name):
+                continue
+            walk(entry.path, entry.stat(follow_symlinks=False))
+
+    walk(str(root), root.stat())
+    return digest.hexdigest()
+
+
+class Inotify:
+    """Minimal inotify(7) binding (via libc) to watch folders for ZIM changes"""
+
+    IN_CLOSE_WRITE = 0x00000008
+    IN_MOVED_FROM = 0x00000040
+    IN_MOVED_TO = 0x00000080
+    IN_CREATE = 0x00000100
+    IN_DELETE = 0x00000200
+    IN_Q_OVERFLOW = 0x00004000
+    IN_IGNORED = 0x00008000
+    IN_ISDIR = 0x40000000
+
+    # file written (closed), renamed into/out of or removed from folder.
+    # creation is only of interest for folders (files are complete once closed)
+    MASK = IN_CLOSE_WRITE | IN_MOVED_FROM | IN_MOVED_TO | IN_CREATE | IN_DELETE
+
+    event_fmt = struct.Struct("iIII")  # wd, mask, cookie, len (then name)
+
+    def __init__(self):
+        self.libc = ctypes.CDLL(ctypes.util.find_library("c"), use_errno=True)
+        self.fd = self.libc.inotify_init1(os.O_CLOEXEC)
+        if self.fd < 0:
+            errno = ctypes.get_errno()
+            raise OSError(errno, f"inotify_init1: {os.strerror(errno)}")
+        self.watches: dict[int, str] = {}  # wd: folder
+
+    def add_watch(self, folder: str):
+        wd = self.libc.inotify_add_watch(self.fd, os.fsencode(folder), self.MASK)
+        if wd < 0:
+            errno = ctypes.get_errno()
+            raise OSError(errno, f"inotify_add_watch: {os.strerror(errno)}", folder)
+        self.watches[wd] = folder
+
+    def add_tree(self, root: pathlib.Path, *, with_hidden: bool):
+        """watch root and its subfolders (as walked by get_zim_files)"""
+        self.add_watch(str(root))
+        try:
+            with os.scandir(root) as it:
+                entries = list(it)
+        except PermissionError:
+            return
+        for entry in entries:
+            if entry.is_dir(follow_symlinks=False) and (
+                with_hidden or not is_excluded_name(entry.name)
+            ):
+                self.add_tree(pathlib.Path(entry.path), with_hidden=with_hidden)
+
+    def read_events(self, timeout: float) -> list[tuple[pathlib.Path | None, int]]:
+        """(path, mask) of events received within timeout seconds (can be empty)
+
+        path is None on queue overflow (events were lost)"""
+        ready, _, _ = select.select([self.fd], [], [], timeout)
+        if not ready:
+            return []
+        data = os.read(self.fd, 64 * 1024)
+        events = []
+        offset = 0
+        while offset < len(data):
+            wd, mask, _, length = self.event_fmt.unpack_from(data, offset)
+            offset += self.event_fmt.size
+            name = os.fsdecode(data[offset : offset + length].rstrip(b"\0"))
+            offset += length
+            if mask & self.IN_Q_OVERFLOW:
+                events.append((None, mask))
+            elif mask & self.IN_IGNORED:
+                # watched folder was removed (or moved out)
+                self.watches.pop(wd, None)
+            elif wd in self.watches:
+                events.append((pathlib.Path(self.watches[wd], name), mask))
+        return events
+
+    def close(self):
+        os.close(self.fd)
+
+
+def get_latest_periods(
+    fpaths: Iterable[pathlib.Path],
+) -> dict[tuple[pathlib.Path, str], str]:
+    """most recent period for each (folder, period-less name) of ZIM filenames
+
+    Allows telling whether a ZIM is the latest version of a Title in one pass"""
+    latest_periods: dict[tuple[pathlib.Path, str], str] = {}
+    for fpath in fpaths:
+        parsed = parse_zim_filename(fpath.stem)
+        key = (fpath.parent, parsed.name)
+        if parsed.period > latest_periods.get(key, ""):
+            latest_periods[key] = parsed.period
+    return latest_periods
+
+
+class ZimHeaderReader:
+    """Lightweight ZIM reader for in-ZIM info, over a memory-mapped file
+
+    Only parses the header, binary-searches the path pointer list for the few
+    entries needed and reads the blobs of their clusters (uncompressed, xz or
+    zstd). Raises ValueError on anything else (old namespace scheme, missing
+    Counter or front articles listing, redirects…) for callers to fall back to
+    a full libzim Archive."""
+
+    header_fmt = struct.Struct("<IHH16sIIQQQQIIQ")
+    MAGIC = 72173914
+    REDIRECT, LINKTARGET, DELETED = 0xFFFF, 0xFFFE, 0xFFFD
+    COMPRESSIONS = {0: None, 1: None, 4: "xz", 5: "zstd"}
 
-def parseable_xml_file(fpath: pathlib.Path) -> bool:
-    """whether Catalog XML file can be parsed as XML"""
+    def __init__(self, fpath: pathlib.Path):
+        with open(fpath, "rb") as fh:
+            self.mm = mmap.mmap(fh.fileno(), 0, access=mmap.ACCESS_READ)
+        (
+            magic,
+            major,
+            minor,
+            self.uuid,
+            self.entry_count,
+            self.cluster_count,
+            self.path_ptr_pos,
+            _,
+            self.cluster_ptr_pos,
+            _,
+            _,
+            _,
+            self.checksum_pos,
+        ) = self.header_fmt.unpack_from(self.mm, 0)
+        if magic != self.MAGIC:
+            raise ValueError("Not a ZIM file")
+        # new namespace scheme (C for content, M for metadata, X for indexes)
+        if major != 6 or minor < 1:  # noqa: PLR2004
+            raise ValueError(f"Unsupported ZIM version {major}.{minor}")
+        self.clusters: dict[int, tuple[bytes | mmap.mmap, int, int]] = {}
+
+    def close(self):
+        self.mm.close()
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *args):
+        self.close()
+
+    def get_dirent(self, index: int) -> tuple[int, str, bytes, int]:
+        """(mimetype, namespace, path, offset after path) of entry at index"""
+        (offset,) = struct.unpack_from("<Q", self.mm, self.path_ptr_pos + 8 * index)
+        mimetype, _, namespace = struct.unpack_from("<HBc", self.mm, offset)
+        # redirect, linktarget and deleted dirents have no blob number
+        start = offset + (12 if mimetype >= self.DELETED else 16)
+        end = self.mm.find(b"\0", start)
+        return mimetype, namespace.decode(), self.mm[start:end], offset
+
+    def find(self, namespace: str, path: str) -> tuple[int, int] | None:
+        """(cluster, blob) numbers of a content entry, if present"""
+        key = (namespace, path.encode("UTF-8"))
+        low, high = 0, self.entry_count
+        while low < high:
+            middle = (low + high) // 2
+            mimetype, entry_ns, entry_path, offset = self.get_dirent(middle)
+            if (entry_ns, entry_path) < key:
+                low = middle + 1
+            elif (entry_ns, entry_path) > key:
+                high = middle
+            elif mimetype >= self.DELETED:
+                raise ValueError(f"{namespace}/{path} is not a content entry")
+            else:
+                return struct.unpack_from("<II", self.mm, offset + 8)
+        return None
+
+    def get_cluster(self, number: int) -> tuple[bytes | mmap.mmap, int, int]:
+        """(buffer, start, offset size) of a cluster's (decompressed) data"""
+        if number in self.clusters:
+            return self.clusters[number]
+        (start,) = struct.unpack_from("<Q", self.mm, self.cluster_ptr_pos + 8 * number)
+        if number + 1 < self.cluster_count:
+            (end,) = struct.unpack_from(
+                "<Q", self.mm, self.cluster_ptr_pos + 8 * (number + 1)
+            )
+        else:
+            end = self.checksum_pos
+        if end <= start:
+            raise ValueError(f"Unordered cluster #{number}")
+        info = self.mm[start]
+        offset_size = 8 if info & 0x10 else 4
+        compression = self.COMPRESSIONS.get(info & 0x0F, "unknown")
+        if compression is None:
+            cluster = (self.mm, start + 1, offset_size)
+        elif compression == "xz":
+            cluster = (
+                lzma.LZMADecompressor().decompress(self.mm[start + 1 : end]),
+                0,
+                offset_size,
+            )
+        elif compression == "zstd" and zstandard:
+            cluster = (
+                zstandard.ZstdDecompressor()
+                .decompressobj()
+                .decompress(self.mm[start + 1 : end]),
+                0,
+                offset_size,
+            )
+        else:
+            raise ValueError(f"Unsupported compression for cluster #{number}")
+        self.clusters[number] = cluster
+        return cluster
+
+    def get_blob(self, namespace: str, path: str) -> bytes | None:
+        """content of an entry, if present"""
+        location = self.find(namespace, path)
+        if location is None:
+            return None
+        number, blob = location
+        data, start, offset_size = self.get_cluster(number)
+        fmt = "<Q" if offset_size == 8 else "<I"  # noqa: PLR2004
+        begin, end = (
+            struct.unpack_from(fmt, data, start + offset_size * index)[0]
+            for index in (blob, blob + 1)
+        )
+        return bytes(data[start + begin : start + end])
+
+    def get_info(self, fpath: pathlib.Path) -> dict[str, str]:
+        """in-ZIM info as read_zim_metadata"""
+        counter = self.get_blob("M", "Counter")
+        listing = self.get_blob("X", "listing/titleOrdered/v1")
+        if counter is None or listing is None:
+            raise ValueError("No Counter metadata or front articles listing")
+        info = {
+            "id": str(uuid.UUID(bytes=self.uuid)),
+            # as libzim: media mimetypes from Counter, front articles from listing
+            "mediaCount": str(
+                sum(
+                    count
+                    for mimetype, count in parseMimetypeCounter(
+                        counter.decode("UTF-8")
+                    ).items()
+                    if mimetype.startswith(("image/", "video/", "audio/"))
+                )
+            ),
+            "articleCount": str(len(listing) // 4),
+        }
+        for meta_name, key in NAMES_MAP.items():
+            value = self.get_blob("M", meta_name)
+            if meta_name == "Tags":
+                # as Archive.get_tags: libkiwix hints even without Tags
+                info[key] = ";".join(convertTags((value or b"").decode("UTF-8")))
+                continue
+            if value is None:
+                if meta_name == "Title":
+                    info[key] = fpath.stem.replace("_", " ")
+                continue
+            info[key] = value.decode("UTF-8")
+        # no legacy favicon to look for with the new namespace scheme
+        illustration = self.get_blob("M", "Illustration_48x48@1")
+        if illustration is not None:
+            info["favicon"] = base64.standard_b64encode(illustration).decode("ASCII")
+        return info
+
+
+def read_zim_metadata(fpath: pathlib.Path) -> dict[str, str]:
+    """in-ZIM info (uuid, counters, metadata and illustration) for a ZIM file
+
+    Read with ZimHeaderReader or a libzim Archive if it can't"""
     try:
-        for _, elem in etree.iterparse(str(fpath)):
-            if elem.tag == "book":
-                assert elem.attrib["id"]
+        with ZimHeaderReader(fpath) as reader:
+            return reader.get_info(fpath)
     except Exception as exc:
-        logger.error(exc)
-        logger.exception(exc)
-        return False
-    return True
+        logger.debug(f"[READ] Reading {fpath.name} with libzim -- {exc}")
 
+    zim = Archive(fpath)
 
-def convert_pub_library_to_internal(
-    pub_library_dest: pathlib.Path,
-    internal_library_dest: pathlib.Path,
-    download_url_root: str,
-    internal_zim_root: pathlib.Path,
-):
-    logger.info(f"[LIBS] Preparing internal Library for {internal_library_dest}")
-
-    int_library_tmp = get_tmp(internal_library_dest)
-    tree = None
-    encoding = "UTF-8"
-    with open_chmod(int_library_tmp, "wb", chmod=0o644) as fh:
-
-        for _, elem in etree.iterparse(str(pub_library_dest), tag="book"):
-            if not tree:
-                tree = elem.getroottree()
-                encoding = tree.docinfo.encoding or encoding
-                fh.write(
-                    (
-                        f'<?xml version="{tree.docinfo.xml_version}" '
-                        f'encoding="{encoding}" ?>\n'
-                        f"<{tree.docinfo.root_name} "
-                        f'version="{tree.getroot().attrib.get("version")}">\n'
-                    ).encode(encoding)
+    info = {
+        "id": str(zim.uuid),
+        "mediaCount": str(zim.media_count),
+        "articleCount": str(zim.article_count),
+    }
+
+    for meta_name in NAMES_MAP.keys():  # noqa: PLC0206
+        try:
+            if meta_name == "Tags":
+                info[NAMES_MAP[meta_name]] = ";".join(zim.get_tags(libkiwix=True))
+                continue
+            info[NAMES_MAP[meta_name]] = zim.get_text_metadata(meta_name)
+        except RuntimeError:
+            if meta_name == "Title":
+                info[NAMES_MAP[meta_name]] = fpath.stem.replace("_", " ")
+            continue
+    if zim.has_illustration(48):
+        info["favicon"] = base64.standard_b64encode(
+            zim.get_illustration_item(48).content
+        ).decode("ASCII")
+
+    return info
+
+
+class ZimInfoCache:
+    """On-disk (SQLite) cache of in-ZIM info, keyed on relpath and file stat
+
+    Entries are only valid as long as size, mtime and inode of the ZIM file
+    match what was recorded so only new or modified ZIMs have to be opened."""
+
+    def __init__(self, fpath: pathlib.Path):
+        self.fpath = fpath
+        self.nb_hits = self.nb_misses = 0
+        self.seen: set[str] = set()
+
+        self.connection = sqlite3.connect(str(fpath))
+        if (
+            self.connection.execute("PRAGMA user_version").fetchone()[0]
+            != ZIM_CACHE_VERSION
+        ):
+            self.connection.execute("DROP TABLE IF EXISTS zims")
+            self.connection.execute(f"PRAGMA user_version = {ZIM_CACHE_VERSION}")
+        self.connection.execute(
+            "CREATE TABLE IF NOT EXISTS zims ("
+            "relpath TEXT PRIMARY KEY, size INTEGER NOT NULL, "
+            "mtime INTEGER NOT NULL, inode INTEGER NOT NULL, info TEXT NOT NULL)"
+        )
+
+    def get(self, relpath: pathlib.Path, stat: os.stat_result) -> dict | None:
+        """cached in-ZIM info for relpath if file has not changed since"""
+        self.seen.add(str(relpath))
+        row = self.connection.execute(
+            "SELECT info FROM zims WHERE relpath = ? AND size = ? "
+            "AND mtime = ? AND inode = ?",
+            (str(relpath), stat.st_size, stat.st_mtime_ns, stat.st_ino),
+        ).fetchone()
+        if row is None:
+            self.nb_misses += 1
+            return None
+        self.nb_hits += 1
+        return json.loads(row[0])
+
+    def set(self, relpath: pathlib.Path, stat: os.stat_result, info: dict):
+        self.seen.add(str(relpath))
+        self.connection.execute(
+            "INSERT OR REPLACE INTO zims (relpath, size, mtime, inode, info) "
+            "VALUES (?, ?, ?, ?, ?)",
+            (
+                str(relpath),
+                stat.st_size,
+                stat.st_mtime_ns,
+                stat.st_ino,
+                json.dumps(info),
+            ),
+        )
+
+    def close(self, *, prune: bool):
+        """commit changes, optionnaly removing entries not requested this run"""
+        if prune:
+            stale = [
+                relpath
+                for (relpath,) in self.connection.execute("SELECT relpath FROM zims")
+                if relpath not in self.seen
+            ]
+            self.connection.executemany(
+                "DELETE FROM zims WHERE relpath = ?", [(relpath,) for relpath in stale]
+            )
+        self.connection.commit()
+        self.connection.close()
+
+
+class RunMetrics:
+    """Durations of run phases and counters (see RUN_METRICS) for a run
+
+    Exported as a Prometheus textfile (node-exporter textfile collector) and
+    optionally as a JSON summary. Phases may nest (mirrorbrain is within
+    readfs). Bytes read are block input (getrusage), including worker processes
+    once they exited."""
+
+    def __init__(self):
+        self.started_on = time.time()
+        # name: {duration, read_bytes}
+        self.phases: dict[str, dict[str, float]] = {}
+        self.counters: dict[str, float] = {}
+
+    @staticmethod
+    def get_read_bytes() -> int:
+        return 512 * sum(
+            resource.getrusage(who).ru_inblock
+            for who in (resource.RUSAGE_SELF, resource.RUSAGE_CHILDREN)
+        )
+
+    @contextmanager
+    def phase(self, name: str):
+        """record duration and bytes read of the block as phase `name`"""
+        started_on = time.monotonic()
+        read_bytes = self.get_read_bytes()
+        try:
+            yield
+        finally:
+            phase = self.phases.setdefault(name, {"duration": 0.0, "read_bytes": 0})
+            phase["duration"] += time.monotonic() - started_on
+            phase["read_bytes"] += self.get_read_bytes() - read_bytes
+
+    def count(self, name: str, value: float = 1):
+        self.counters[name] = self.counters.get(name, 0) + value
+
+    def set(self, name: str, value: float):
+        self.counters[name] = value
+
+    def to_dict(self, *, succeeded: bool) -> dict[str, Any]:
+        return {
+            "started_on": self.started_on,
+            "duration": time.time() - self.started_on,
+            "succeeded": succeeded,
+            "phases": self.phases,
+            "counters": self.counters,
+        }
+
+    def write_textfile(self, fpath: pathlib.Path, *, succeeded: bool):
+        """write metrics in Prometheus text format (swapped in place)"""
+        summary = self.to_dict(succeeded=succeeded)
+        lines = []
+
+        def add(name: str, text: str, values: list[tuple[str, float]]):
+            lines.append(f"# HELP library_maint_{name} {text}")
+            lines.append(f"# TYPE library_maint_{name} gauge")
+            lines.extend(
+                f"library_maint_{name}{labels} {value}" for labels, value in values
+            )
+
+        add(
+            "last_run_timestamp_seconds",
+            "start time of last run",
+            [("", summary["started_on"])],
+        )
+        add(
+            "last_run_duration_seconds",
+            "duration of last run",
+            [("", summary["duration"])],
+        )
+        add("last_run_success", "whether last run succeeded", [("", int(succeeded))])
+        for metric, key, text in (
+            ("phase_duration_seconds", "duration", "duration of phase in last run"),
+            ("phase_read_bytes", "read_bytes", "bytes read during phase in last run"),
+        ):
+            add(
+                metric,
+                text,
+                [
+                    (f'{{phase="{name}"}}', phase[key])
+                    for name, phase in self.phases.items()
+                ],
+            )
+        for name, value in self.counters.items():
+            add(name, f"{RUN_METRICS.get(name, name)} in last run", [("", value)])
+
+        tmp = get_tmp(fpath)
+        with open_chmod(tmp, "w", chmod=0o644) as fh:
+            fh.write("\n".join(lines) + "\n")
+        swap(tmp, fpath)
+
+    def write_json(self, fpath: pathlib.Path, *, succeeded: bool):
+        tmp = get_tmp(fpath)
+        with open_chmod(tmp, "w", chmod=0o644) as fh:
+            json.dump(self.to_dict(succeeded=succeeded), fh, indent=4)
+        swap(tmp, fpath)
+
+
+class TrashReclaimer(threading.Thread):
+    """Reclaims space of ZIM files moved to a trash folder, in the background
+
+    Files (oldest first) are truncated in steps of truncate_step bytes (at once
+    if 0) then removed, at most rate bytes per second (unlimited if 0) and with
+    idle I/O priority (as `ionice -c3`) so the disk keeps serving downloads.
+    Files moved to trash while running are reclaimed as well."""
+
+    # ioprio_set(2) syscall number per architecture
+    IOPRIO_SET_SYSCALLS = {"x86_64": 251, "aarch64": 30, "armv7l": 314, "i686": 289}
+    IOPRIO_WHO_PROCESS = 1
+    IOPRIO_CLASS_IDLE = 3
+    IOPRIO_CLASS_SHIFT = 13
+
+    def __init__(self, trash: pathlib.Path, *, rate: int, truncate_step: int):
+        super().__init__(name="trash-reclaimer")
+        self.trash = trash
+        self.rate = rate
+        self.truncate_step = truncate_step
+        self.nb_reclaimed = self.reclaimed_size = 0
+
+    def set_idle_io_priority(self):
+        """idle I/O scheduling class for this thread (honored by BFQ/CFQ)"""
+        libc = ctypes.CDLL(ctypes.util.find_library("c"), use_errno=True)
+        syscall = self.IOPRIO_SET_SYSCALLS.get(platform.machine())
+        # who=0 is the calling thread
+        if (
+            syscall is None
+            or libc.syscall(
+                syscall,
+                self.IOPRIO_WHO_PROCESS,
+                0,
+                self.IOPRIO_CLASS_IDLE << self.IOPRIO_CLASS_SHIFT,
+            )
+            < 0
+        ):
+            logger.warning("[TRASH] Unable to set idle I/O priority")
+
+    def throttle(self, size: int):
+        if self.rate:
+            time.sleep(size / self.rate)
+
+    def reclaim(self, fpath: pathlib.Path):
+        size = fpath.stat().st_size
+        logger.info(f"[TRASH] reclaiming {fpath} ({human_size(size)})")
+        remaining = size
+        if self.truncate_step:
+            while remaining > self.truncate_step:
+                remaining -= self.truncate_step
+                os.truncate(fpath, remaining)
+                self.throttle(self.truncate_step)
+        fpath.unlink()
+        self.throttle(remaining)
+        self.nb_reclaimed += 1
+        self.reclaimed_size += size
+
+    def run(self):
+        self.set_idle_io_priority()
+        while fpaths := sorted(
+            (fpath for fpath in self.trash.rglob("*") if fpath.is_file()),
+            key=lambda fpath: fpath.stat().st_mtime,
+        ):
+            for fpath in fpaths:
+                try:
+                    self.reclaim(fpath)
+                except Exception as exc:
+                    logger.error(f"[TRASH] Unable to reclaim {fpath} -- {exc}")
+                    return
+        # remove emptied folders (not trash itself)
+        for folder in sorted(self.trash.rglob("*"), reverse=True):
+            if folder.is_dir() and not any(folder.iterdir()):
+                folder.rmdir()
+        logger.info(
+            f"[TRASH] reclaimed {self.nb_reclaimed} files, "
+            f"{human_size(self.reclaimed_size)}"
+        )
+
+
+class CompressedVariant:
+    """Compressed copy of a file (fpath.gz, .br or .zst), streamed as it's written"""
+
+    def __init__(self, fpath: pathlib.Path, suffix: str):
+        self.fpath = fpath.with_name(f"{fpath.name}.{suffix}")
+        self.tmp = get_tmp(self.fpath)
+        self.size = 0
+        self.fh: Any = None
+
+        if suffix == "gz":
+            # wbits=31 for a gzip container
+            compressor = zlib.compressobj(GZIP_LEVEL, zlib.DEFLATED, 31)
+            self.compress, self.flush = compressor.compress, compressor.flush
+        elif suffix == "br":
+            compressor = brotli.Compressor(quality=BROTLI_QUALITY)
+            self.compress, self.flush = compressor.process, compressor.finish
+        elif suffix == "zst":
+            compressor = zstandard.ZstdCompressor(level=ZSTD_LEVEL).compressobj()
+            self.compress, self.flush = compressor.compress, compressor.flush
+        else:
+            raise ValueError(f"Unsupported compression: {suffix}")
+
+    def write(self, data: bytes):
+        compressed = self.compress(data)
+        self.fh.write(compressed)
+        self.size += len(compressed)
+
+    def finish(self):
+        compressed = self.flush()
+        self.fh.write(compressed)
+        self.size += len(compressed)
+
+
+class LibraryWriter:
+    """Streaming XML Library writer, well-formed by construction
+
+    Content is written to a temporary file through lxml's incremental writer
+    while its SHA256 digest, number of books and books byte ranges are computed,
+    and compressed into requested variants. Use via `write_library()` which swaps
+    the file, its variants, its index and digest sidecars in place."""
+
+    def __init__(self, fpath: pathlib.Path, compressions: Iterable[str] = ()):
+        self.fpath = fpath
+        self.tmp = get_tmp(fpath)
+        self.digest = hashlib.sha256()
+        self.nb_books = 0
+        self.size = 0
+        # (index keys, offset, length) of each book
+        self.books: list[tuple[list[str], int, int]] = []
+        self.fh: Any = None
+        self.xf: Any = None
+        self.variants = [CompressedVariant(fpath, suffix) for suffix in compressions]
+
+        # digest of the current (previous) library, if any
+        try:
+            self.previous_hexdigest = self.digest_fpath.read_text().split(" ", 1)[0]
+        except Exception:
+            self.previous_hexdigest = ""
+
+    @property
+    def digest_fpath(self) -> pathlib.Path:
+        """sha256sum-formatted sidecar, usable as an ETag"""
+        return self.fpath.with_name(f"{self.fpath.name}.sha256")
+
+    @property
+    def index_fpath(self) -> pathlib.Path:
+        """LibraryIndex sidecar"""
+        return self.fpath.with_name(f"{self.fpath.name}.idx")
+
+    @property
+    def hexdigest(self) -> str:
+        return self.digest.hexdigest()
+
+    def write(self, data: bytes):
+        """file-like interface for xmlfile"""
+        self.fh.write(data)
+        self.digest.update(data)
+        self.size += len(data)
+        for variant in self.variants:
+            variant.write(data)
+
+    def add_book(self, elem: etree._Element):
+        # flush xmlfile so size is the actual offset of the book
+        self.xf.flush()
+        offset = self.size
+        self.xf.write(elem)
+        self.xf.flush()
+        self.books.append((to_index_keys(elem.attrib), offset, self.size - offset))
+        self.xf.write("\n")
+        self.nb_books += 1
+
+    def write_index(self, fpath: pathlib.Path):
+        """LibraryIndex sidecar: open-addressing table of books byte ranges
+
+        Only the first book of a key (same ZIM at several paths) is indexed"""
+        seen: set[str] = set()
+        # 0.75 load factor
+        nb_slots = sum(len(keys) for keys, _, _ in self.books) * 4 // 3 + 1
+        table = bytearray(nb_slots * LIBRARY_INDEX_SLOT.size)
+        for keys, offset, length in self.books:
+            for key in keys:
+                if key in seen:
+                    continue
+                seen.add(key)
+                key_hash = to_index_hash(key)
+                slot = key_hash % nb_slots
+                # linear probing until an empty slot
+                while LIBRARY_INDEX_SLOT.unpack_from(
+                    table, slot * LIBRARY_INDEX_SLOT.size
+                )[2]:
+                    slot = (slot + 1) % nb_slots
+                LIBRARY_INDEX_SLOT.pack_into(
+                    table, slot * LIBRARY_INDEX_SLOT.size, key_hash, offset, length
                 )
+        with open_chmod(fpath, "wb", chmod=0o644) as fh:
+            fh.write(LIBRARY_INDEX_MAGIC)
+            fh.write(
+                LIBRARY_INDEX_HEADER.pack(
+                    LIBRARY_INDEX_VERSION, nb_slots, self.size, self.digest.digest()
+                )
+            )
+            fh.write(table)
+
+    def swap(self):
+        """swap variants, index, file then digest (variants never older than the file)
+
+        Index is swapped first so LibraryIndex sees it stale until the digest is
+        swapped. Variants that were not requested are removed as they would be
+        stale"""
+        index_tmp = get_tmp(self.index_fpath)
+        self.write_index(index_tmp)
+        digest_tmp = get_tmp(self.digest_fpath)
+        with open_chmod(digest_tmp, "w", chmod=0o644) as fh:
+            fh.write(f"{self.hexdigest}  {self.fpath.name}\n")
+        requested = [variant.fpath for variant in self.variants]
+        for suffix in LIBRARY_COMPRESSION_MODULES:
+            stale = self.fpath.with_name(f"{self.fpath.name}.{suffix}")
+            if stale not in requested:
+                stale.unlink(missing_ok=True)
+        for variant in self.variants:
+            swap(variant.tmp, variant.fpath)
+        swap(index_tmp, self.index_fpath)
+        swap(self.tmp, self.fpath)
+        swap(digest_tmp, self.digest_fpath)
 
-            # internal library path is constructed from relative download path
-            # in URL and prefix with internal_zim_root
-            elem.set(
-                "path",
-                re.sub(
-                    r"^" + download_url_root + r"(.+).meta4$",
-                    str(internal_zim_root) + r"/\1",
-                    elem.attrib["url"],
-                ),
+
+@contextmanager
+def write_library(
+    fpath: pathlib.Path, compressions: Iterable[str] = ()
+) -> Generator[LibraryWriter, None, None]:
+    """LibraryWriter for fpath, swapped in place once successfuly written"""
+    writer = LibraryWriter(fpath, compressions)
+    try:
+        with ExitStack() as stack:
+            writer.fh = stack.enter_context(open_chmod(writer.tmp, "wb", chmod=0o644))
+            for variant in writer.variants:
+                variant.fh = stack.enter_context(
+                    open_chmod(variant.tmp, "wb", chmod=0o644)
+                )
+            writer.write(b'<?xml version="1.0" encoding="UTF-8" ?>\n')
+            with etree.xmlfile(writer, encoding="UTF-8") as xf:
+                writer.xf = xf
+                with xf.element("library", version="20110515"):
+                    xf.write("\n")
+                    yield writer
+            writer.write(b"\n")
+            for variant in writer.variants:
+                variant.finish()
+    except BaseException:
+        writer.tmp.unlink(missing_ok=True)
+        for variant in writer.variants:
+            variant.tmp.unlink(missing_ok=True)
+        raise
+    writer.swap()
+
+
+def to_index_keys(attrib: Any) -> list[str]:
+    """LibraryIndex keys of a book (from its XML attributes): id, core and alias"""
+    fname = fname_from_url(attrib["url"])
+    return [
+        f"id:{attrib['id']}",
+        f"core:{to_core(fname)}",
+        f"alias:{to_human_alias(fname)}",
+    ]
+
+
+def to_index_hash(key: str) -> int:
+    return int.from_bytes(hashlib.blake2b(key.encode(), digest_size=4).digest())
+
+
+class LibraryIndex:
+    """Random access to an XML Library's books, via its index sidecar
+
+    Looks up the byte range of a book by id, core or alias in the memory-mapped
+    index and reads just that <book /> from the library. Books are checked
+    against the key (hash collisions) and the library against the size and
+    SHA256 digest (its .sha256 sidecar) it was indexed with.
+    Raises ValueError on missing, invalid or stale index."""
+
+    KINDS = ("id", "core", "alias")
+
+    def __init__(self, fpath: pathlib.Path):
+        self.fpath = fpath
+        self.fd = os.open(fpath, os.O_RDONLY)
+        try:
+            with open(fpath.with_name(f"{fpath.name}.idx"), "rb") as fh:
+                self.mm = mmap.mmap(fh.fileno(), 0, access=mmap.ACCESS_READ)
+        except (OSError, ValueError) as exc:
+            os.close(self.fd)
+            raise ValueError(f"No usable index for {fpath}: {exc}") from exc
+        try:
+            if self.mm[: len(LIBRARY_INDEX_MAGIC)] != LIBRARY_INDEX_MAGIC:
+                raise ValueError(f"Not a library index for {fpath}")
+            version, self.nb_slots, size, digest = LIBRARY_INDEX_HEADER.unpack_from(
+                self.mm, len(LIBRARY_INDEX_MAGIC)
             )
-            fh.write(etree.tostring(elem, encoding=tree.docinfo.encoding))
-        fh.write(f"</{tree.docinfo.root_name}>\n".encode(encoding))
+            if version != LIBRARY_INDEX_VERSION:
+                raise ValueError(f"Unsupported library index version {version}")
+            if (
+                size != os.fstat(self.fd).st_size
+                or digest.hex() != self.get_library_hexdigest()
+            ):
+                raise ValueError(f"Library index is stale for {fpath}")
+        except Exception:
+            self.close()
+            raise
+        self.table_offset = len(LIBRARY_INDEX_MAGIC) + LIBRARY_INDEX_HEADER.size
 
-    logger.info("[LIBS] Internal Library successfuly generated. Verifying XML…")
-    assert parseable_xml_file(int_library_tmp)
-    logger.info("[LIBS] XML is well formed. Swaping files…")
-    swap(int_library_tmp, internal_library_dest)
-    logger.info("[LIBS] > done.")
+    def get_library_hexdigest(self) -> str:
+        """SHA256 of the library, from the sidecar written with it (as LibraryWriter)"""
+        try:
+            return (
+                self.fpath.with_name(f"{self.fpath.name}.sha256")
+                .read_text()
+                .split(" ", 1)[0]
+            )
+        except OSError as exc:
+            raise ValueError(f"No digest for {self.fpath}: {exc}") from exc
+
+    def close(self):
+        self.mm.close()
+        os.close(self.fd)
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *args):
+        self.close()
+
+    def get_book(self, kind: str, value: str) -> etree._Element | None:
+        """<book /> element whose kind (see KINDS) is value, if any"""
+        key = f"{kind}:{value}"
+        key_hash = to_index_hash(key)
+        slot = key_hash % self.nb_slots
+        while True:
+            slot_hash, offset, length = LIBRARY_INDEX_SLOT.unpack_from(
+                self.mm, self.table_offset + slot * LIBRARY_INDEX_SLOT.size
+            )
+            if not length:
+                return None
+            if slot_hash == key_hash:
+                try:
+                    book = etree.fromstring(os.pread(self.fd, length, offset))
+                except etree.XMLSyntaxError as exc:
+                    raise ValueError(
+                        f"Library index is stale for {self.fpath}"
+                    ) from exc
+                if key in to_index_keys(book.attrib):
+                    return book
+            slot = (slot + 1) % self.nb_slots
+
+
+def to_book_element(entry: ZimEntry) -> etree._Element:
+    """XML Library <book /> element for a ZIM entry"""
+    elem = etree.Element("book")
+    for attr in COPIED_KEYS:
+        if entry.get(attr):
+            elem.set(attr, entry.get(attr))
+        elem.set("faviconMimeType", "image/png")
+    assert elem.get("id")  # safeguard that we dont write entry without data
+    return elem
+
+
+def to_shard_names(entry: ZimEntry, kind: str) -> list[str]:
+    """names of the shards of kind (see LIBRARY_SHARD_KINDS) entry belongs to
+
+    category from `_category:` tags, lang from (ISO-639-3) Language metadata and
+    project from PROJECTS_PRIO (`other` if not in it)"""
+    if kind == "category":
+        names = [
+            tag[len("_category:") :]
+            for tag in entry.tags.split(";")
+            if tag.startswith("_category:")
+        ]
+    elif kind == "lang":
+        names = entry.language.split(",")
+    elif kind == "project":
+        names = [entry.project if entry.project in PROJECTS_PRIO else "other"]
+    else:
+        raise ValueError(f"Unsupported library shard kind: {kind}")
+    # names are used as filenames
+    return [re.sub(r"[^\w.-]", "_", name.strip()) for name in names if name.strip()]
+
+
+def write_static(fpath: pathlib.Path, data: bytes, compressions: Iterable[str] = ()):
+    """write data and its compressed variants, swapped in place
+
+    Variants that were not requested are removed as they would be stale"""
+    variants = [CompressedVariant(fpath, suffix) for suffix in compressions]
+    tmp = get_tmp(fpath)
+    try:
+        for variant in variants:
+            with open_chmod(variant.tmp, "wb", chmod=0o644) as variant.fh:
+                variant.write(data)
+                variant.finish()
+        with open_chmod(tmp, "wb", chmod=0o644) as fh:
+            fh.write(data)
+    except BaseException:
+        tmp.unlink(missing_ok=True)
+        for variant in variants:
+            variant.tmp.unlink(missing_ok=True)
+        raise
+    requested = [variant.fpath for variant in variants]
+    for suffix in LIBRARY_COMPRESSION_MODULES:
+        stale = fpath.with_name(f"{fpath.name}.{suffix}")
+        if stale not in requested:
+            stale.unlink(missing_ok=True)
+    for variant in variants:
+        swap(variant.tmp, variant.fpath)
+    swap(tmp, fpath)
+
+
+class OpdsCatalogWriter:
+    """Static OPDS v2 catalog (as kiwix-serve's /catalog/v2) for exposed ZIMs
+
+    Written to dest, for the webserver to answer hot catalog URLs with:
+    - root.xml, searchdescription.xml, categories.xml, languages.xml
+    - entries.xml: all entries (/entries?count=-1)
+    - entries/<start>-<count>.xml: pages of page_size (/entries?start=&count=)
+    - entries/lang/<lang>.xml and entries/category/<category>.xml: all entries
+      of a language or category (/entries?lang=&count=-1)
+    Links are prefixed with root_url. Languages are titled with their native name
+    (as kiwix-serve), or their code if unknown."""
+
+    def __init__(
+        self,
+        dest: pathlib.Path,
+        *,
+        root_url: str,
+        page_size: int,
+        compressions: Iterable[str] = (),
+    ):
+        self.dest = dest
+        self.catalog_url = f"{root_url.rstrip('/')}/catalog/v2"
+        self.root_url = root_url.rstrip("/")
+        self.page_size = page_size
+        self.compressions = list(compressions)
+        self.updated = datetime.datetime.now(datetime.UTC).strftime(
+            "%Y-%m-%dT%H:%M:%SZ"
+        )
+        self.written: set[pathlib.Path] = set()
+
+    @staticmethod
+    def add(parent: etree._Element, tag: str, text: str = "", **attrib: str):
+        """add a child to parent. tag may be prefixed (dc:issued)"""
+        prefix, _, name = tag.rpartition(":")
+        elem = etree.SubElement(parent, f"{{{OPDS_NSMAP[prefix or None]}}}{name}")
+        for key, value in attrib.items():
+            elem.set(key, value)
+        if text:
+            elem.text = text
+        return elem
+
+    def feed(self, path: str, title: str, mimetype: str) -> etree._Element:
+        feed = etree.Element(f"{{{OPDS_NSMAP[None]}}}feed", nsmap=OPDS_NSMAP)
+        self.add(feed, "id", f"urn:uuid:{uuid.uuid5(uuid.NAMESPACE_URL, path)}")
+        self.add(
+            feed, "link", rel="self", href=f"{self.catalog_url}{path}", type=mimetype
+        )
+        for rel in ("start", "up"):
+            self.add(
+                feed,
+                "link",
+                rel=rel,
+                href=f"{self.catalog_url}/root.xml",
+                type=OPDS_NAVIGATION_MIMETYPE,
+            )
+        self.add(feed, "title", title)
+        self.add(feed, "updated", self.updated)
+        return feed
+
+    def add_book(self, feed: etree._Element, entry: ZimEntry):
+        date = f"{entry.date or f'{entry.year}-{entry.month}-01'}T00:00:00Z"
+        elem = self.add(feed, "entry")
+        self.add(elem, "id", f"urn:uuid:{entry.id}")
+        self.add(elem, "title", entry.title)
+        self.add(elem, "updated", date)
+        self.add(elem, "summary", entry.description)
+        self.add(elem, "language", entry.language)
+        self.add(elem, "name", entry.name)
+        self.add(elem, "flavour", entry.flavour)
+        self.add(elem, "category", ",".join(to_shard_names(entry, "category")))
+        self.add(elem, "tags", entry.tags)
+        self.add(elem, "articleCount", entry.articleCount)
+        self.add(elem, "mediaCount", entry.mediaCount)
+        if entry.favicon:
+            self.add(
+                elem,
+                "link",
+                rel="http://opds-spec.org/image/thumbnail",
+                href=f"{self.catalog_url}/illustration/{entry.id}/?size=48",
+                type="image/png;width=48;height=48;scale=1",
+            )
+        self.add(
+            elem,
+            "link",
+            type="text/html",
+            href=f"{self.root_url}/content/{to_human_id(entry.relpath)}",
+        )
+        self.add(self.add(elem, "author"), "name", entry.creator)
+        self.add(self.add(elem, "publisher"), "name", entry.publisher)
+        self.add(elem, "dc:issued", date)
+        self.add(
+            elem,
+            "link",
+            rel="http://opds-spec.org/acquisition/open-access",
+            type="application/x-zim",
+            # as kiwix-serve: library url (metalink) and size (KiB) in bytes
+            href=entry.url,
+            length=str(int(entry.size) * 1024),
+        )
+
+    @staticmethod
+    @functools.cache
+    def get_language_name(lang: str) -> str:
+        """native name of an ISO-639-3 language code (code itself if unknown)"""
+        details = get_language_details(lang, failsafe=True)
+        if not details:
+            return lang
+        # querying the 639-1 code gets the plain name (English, not English (US))
+        return find_language_names(details.get("iso-639-1") or lang, details)[0]
+
+    @property
+    def nb_documents(self) -> int:
+        return len(self.written)
+
+    def write(self, relpath: str, root: etree._Element):
+        fpath = self.dest / relpath
+        fpath.parent.mkdir(parents=True, exist_ok=True)
+        write_static(
+            fpath,
+            etree.tostring(root, xml_declaration=True, encoding="UTF-8"),
+            self.compressions,
+        )
+        self.written.add(fpath)
+
+    def remove_stale(self):
+        """remove documents (and variants) from previous runs not written in this one"""
+        for fpath in list(self.dest.rglob("*.xml")):
+            if fpath in self.written:
+                continue
+            logger.debug(f"[LIBS] > removing stale OPDS document {fpath}")
+            fpath.unlink()
+            for suffix in LIBRARY_COMPRESSION_MODULES:
+                fpath.with_name(f"{fpath.name}.{suffix}").unlink(missing_ok=True)
+
+    def write_entries(
+        self,
+        relpath: str,
+        path: str,
+        entries: list[ZimEntry],
+        *,
+        start: int = 0,
+        total: int | None = None,
+    ):
+        """acquisition feed of entries (a page of total if start or total set)"""
+        feed = self.feed(
+            path,
+            "All Entries" if path == "/entries?count=-1" else "Filtered Entries",
+            OPDS_ACQUISITION_MIMETYPE,
+        )
+        self.add(feed, "totalResults", str(len(entries) if total is None else total))
+        self.add(feed, "startIndex", str(start))
+        self.add(feed, "itemsPerPage", str(len(entries)))
+        for entry in entries:
+            self.add_book(feed, entry)
+        self.write(relpath, feed)
+
+    def write_navigation(self, relpath: str, path: str, title: str, items: list):
+        """navigation feed of (title, href, mimetype, content, extra children)"""
+        feed = self.feed(path, title, OPDS_NAVIGATION_MIMETYPE)
+        if path == "/root.xml":
+            self.add(
+                feed,
+                "link",
+                rel="search",
+                type="application/opensearchdescription+xml",
+                href=f"{self.catalog_url}/searchdescription.xml",
+            )
+        for item_title, href, mimetype, content, children in items:
+            elem = self.add(feed, "entry")
+            self.add(elem, "title", item_title)
+            for tag, text in children:
+                self.add(elem, tag, text)
+            self.add(elem, "link", rel="subsection", href=href, type=mimetype)
+            self.add(elem, "updated", self.updated)
+            self.add(elem, "id", f"urn:uuid:{uuid.uuid5(uuid.NAMESPACE_URL, href)}")
+            self.add(elem, "content", content, type="text")
+        self.write(relpath, feed)
+
+    def write_searchdescription(self):
+        root = etree.Element(
+            "{http://a9.com/-/spec/opensearch/1.1/}OpenSearchDescription",
+            nsmap={
+                None: "http://a9.com/-/spec/opensearch/1.1/",
+                "atom": OPDS_NSMAP[None],
+                "k": "http://kiwix.org/opensearchextension/1.0",
+            },
+        )
+        for tag, text in (("ShortName", "Kiwix"), ("Description", "Search content")):
+            etree.SubElement(root, f"{{{root.nsmap[None]}}}{tag}").text = text
+        etree.SubElement(
+            root,
+            f"{{{root.nsmap[None]}}}Url",
+            type=OPDS_ACQUISITION_MIMETYPE,
+            indexOffset="0",
+            template=f"{self.catalog_url}/entries?q={{searchTerms?}}"
+            "&lang={language?}&name={k:name?}&tag={k:tag?}&notag={k:notag?}"
+            "&maxsize={k:maxsize?}&count={count?}&start={startIndex?}",
+        )
+        self.write("searchdescription.xml", root)
+
+    def write_catalog(self, entries: list[ZimEntry]):
+        """all documents for entries (in catalog order), removing stale ones"""
+        # kind: name: entries
+        filtered: dict[str, dict[str, list[ZimEntry]]] = {}
+        for entry in entries:
+            for kind in ("lang", "category"):
+                for name in to_shard_names(entry, kind):
+                    filtered.setdefault(kind, {}).setdefault(name, []).append(entry)
+
+        self.write_entries("entries.xml", "/entries?count=-1", entries)
+        for start in range(0, len(entries), self.page_size):
+            self.write_entries(
+                f"entries/{start}-{self.page_size}.xml",
+                f"/entries?start={start}&count={self.page_size}",
+                entries[start : start + self.page_size],
+                start=start,
+                total=len(entries),
+            )
+        for kind, names in filtered.items():
+            for name, kind_entries in sorted(names.items()):
+                self.write_entries(
+                    f"entries/{kind}/{name}.xml",
+                    f"/entries?{kind}={name}&count=-1",
+                    kind_entries,
+                )
+
+        self.write_navigation(
+            "categories.xml",
+            "/categories",
+            "List of categories",
+            [
+                (
+                    name,
+                    f"{self.catalog_url}/entries?category={name}",
+                    OPDS_ACQUISITION_MIMETYPE,
+                    f"All entries with category of '{name}'.",
+                    [],
+                )
+                for name in sorted(filtered.get("category", {}))
+            ],
+        )
+        self.write_navigation(
+            "languages.xml",
+            "/languages",
+            "List of languages",
+            [
+                (
+                    self.get_language_name(name),
+                    f"{self.catalog_url}/entries?lang={name}",
+                    OPDS_ACQUISITION_MIMETYPE,
+                    f"All entries in language '{self.get_language_name(name)}'.",
+                    [("dc:language", name), ("thr:count", str(len(lang_entries)))],
+                )
+                for name, lang_entries in sorted(filtered.get("lang", {}).items())
+            ],
+        )
+        self.write_navigation(
+            "root.xml",
+            "/root.xml",
+            "OPDS Catalog Root",
+            [
+                (
+                    "All entries",
+                    f"{self.catalog_url}/entries",
+                    OPDS_ACQUISITION_MIMETYPE,
+                    "All entries from this catalog.",
+                    [],
+                ),
+                (
+                    "List of categories",
+                    f"{self.catalog_url}/categories",
+                    OPDS_NAVIGATION_MIMETYPE,
+                    "List of all categories in this catalog.",
+                    [],
+                ),
+                (
+                    "List of languages",
+                    f"{self.catalog_url}/languages",
+                    OPDS_NAVIGATION_MIMETYPE,
+                    "List of all languages in this catalog.",
+                    [],
+                ),
+            ],
+        )
+        self.write_searchdescription()
+        self.remove_stale()
 
 
 class JSONEncoder(json.JSONEncoder):
     def default(self, o):
         if isinstance(o, pathlib.Path):
             return str(o)
+        if isinstance(o, ZimEntry):
+            return o.to_dict()
         if isinstance(o, datetime.datetime):
             return o.isoformat()
         return json.JSONEncoder.default(self, o)
 
 
+def dump_fs_snapshot(
+    fpath: pathlib.Path, all_zims: dict[str, list[ZimEntry]], mtimes: dict[str, int]
+):
+    """Writes all_zims (and ZIM mtimes) to a binary snapshot
+
+    Layout (little-endian): magic, version (H), nb. of fields (H) then fields
+    as (name, type); nb. of aliases (I) then for each alias its name, nb. of
+    entries (I) and entries as a bitmask (Q) of present fields followed by
+    their values. str and bytes are prefixed with their length (I)."""
+
+    def encode(kind: str, value: Any) -> bytes:
+        if kind == "q":
+            return struct.pack("<q", value)
+        if kind == "?":
+            return struct.pack("<?", value)
+        data = base64.standard_b64decode(value) if kind == "b" else str(value).encode()
+        return struct.pack("<I", len(data)) + data
+
+    tmp = get_tmp(fpath)
+    with open_chmod(tmp, "wb", chmod=0o644) as fh:
+        fh.write(FS_SNAPSHOT_MAGIC)
+        fh.write(struct.pack("<HH", FS_SNAPSHOT_VERSION, len(FS_SNAPSHOT_FIELDS)))
+        for name, kind in FS_SNAPSHOT_FIELDS:
+            fh.write(encode("s", name) + encode("s", kind))
+        fh.write(struct.pack("<I", len(all_zims)))
+        for alias, entries in all_zims.items():
+            fh.write(encode("s", alias) + struct.pack("<I", len(entries)))
+            for entry in entries:
+                record = {
+                    **entry.to_dict(),
+                    "mtime_ns": mtimes.get(str(entry.relpath), 0),
+                }
+                present = [
+                    (index, kind, record[name])
+                    for index, (name, kind) in enumerate(FS_SNAPSHOT_FIELDS)
+                    if name in record
+                ]
+                fh.write(struct.pack("<Q", sum(1 << index for index, _, _ in present)))
+                for _, kind, value in present:
+                    fh.write(encode(kind, value))
+    swap(tmp, fpath)
+
+
+def load_fs_snapshot(
+    fpath: pathlib.Path,
+) -> tuple[dict[str, list[ZimEntry]], dict[str, int]]:
+    """(all_zims, mtimes) from a binary snapshot written by dump_fs_snapshot
+
+    Fields are decoded according to the snapshot's header so snapshots with
+    different fields are still readable. Raises ValueError on other versions"""
+    data = fpath.read_bytes()
+    offset = len(FS_SNAPSHOT_MAGIC)
+    if data[:offset] != FS_SNAPSHOT_MAGIC:
+        raise ValueError(f"{fpath} is not a filesystem snapshot")
+
+    def unpack(fmt: str) -> Any:
+        nonlocal offset
+        values = struct.unpack_from(fmt, data, offset)
+        offset += struct.calcsize(fmt)
+        return values[0] if len(values) == 1 else values
+
+    def decode(kind: str) -> Any:
+        nonlocal offset
+        if kind == "q":
+            return unpack("<q")
+        if kind == "?":
+            return unpack("<?")
+        length = unpack("<I")
+        value = data[offset : offset + length]
+        offset += length
+        if kind == "b":
+            return base64.standard_b64encode(value).decode("ASCII")
+        if kind == "p":
+            return pathlib.Path(value.decode())
+        if kind == "s":
+            return value.decode()
+        raise ValueError(f"Unknown field type in snapshot: {kind}")
+
+    version, nb_fields = unpack("<HH")
+    if version != FS_SNAPSHOT_VERSION:
+        raise ValueError(f"Unsupported snapshot version {version}")
+    fields = [(decode("s"), decode("s")) for _ in range(nb_fields)]
+
+    all_zims: dict[str, list[ZimEntry]] = {}
+    mtimes: dict[str, int] = {}
+    for _ in range(unpack("<I")):
+        alias = decode("s")
+        all_zims[alias] = []
+        for _ in range(unpack("<I")):
+            mask = unpack("<Q")
+            entry = {
+                name: decode(kind)
+                for index, (name, kind) in enumerate(fields)
+                if mask & (1 << index)
+            }
+            mtimes[str(entry["relpath"])] = entry.pop("mtime_ns", 0)
+            all_zims[alias].append(ZimEntry.from_dict(entry))
+    return all_zims, mtimes
+
+
 class PreviousLib:
     def __init__(self, fpath: pathlib.Path):
-        self.books: dict[str, dict] = {}  # core: entry
+        self.books: dict[str, bytes] = {}  # core: fingerprint
         self.aliases: dict[str, str] = {}  # human: id
+        self.infos: dict[str, tuple[str, str, str]] = {}  # core: (id, url, size)
+        self.cores: dict[str, set[str]] = {}  # human: cores
         self.read = False
 
         try:
             self.date = datetime.datetime.fromtimestamp(
                 fpath.stat().st_mtime, datetime.UTC
             )
-            tree = etree.parse(str(fpath))  # noqa: S320
+            # stream books, only keeping a fingerprint of each
+            for _, book in etree.iterparse(str(fpath), tag="book"):
+                self.record(book.attrib)
+                book.clear()
+                while book.getprevious() is not None:
+                    del book.getparent()[0]
         except Exception:
+            self.books.clear()
+            self.aliases.clear()
+            self.infos.clear()
+            self.cores.clear()
             logger.warning("[READ] Unbale to read previous library. Purging disabled.")
             return
 
-        for book in tree.findall("book"):
-            purl = fname_from_url(book.attrib["url"])
-            self.books[to_core(purl)] = to_std_dict(book.attrib)
-            if to_human_alias(purl) not in self.aliases:
-                self.aliases[to_human_alias(purl)] = book.attrib["id"]
-
         self.read = True
 
+    def record(self, attrib):
+        """add or update a book (from its XML attributes)"""
+        purl = fname_from_url(attrib["url"])
+        self.books[to_core(purl)] = to_std_fingerprint(attrib)
+        self.aliases.setdefault(to_human_alias(purl), attrib["id"])
+        self.infos[to_core(purl)] = (
+            attrib["id"],
+            attrib["url"],
+            attrib.get("size", ""),
+        )
+        self.cores.setdefault(to_human_alias(purl), set()).add(to_core(purl))
+
+    def forget(self, book_core):
+        """remove a book (and its alias), once not in library anymore"""
+        _, url, _ = self.infos.pop(book_core)
+        book_human = to_human_alias(fname_from_url(url))
+        self.books.pop(book_core, None)
+        self.aliases.pop(book_human, None)
+        self.cores.get(book_human, set()).discard(book_core)
+
+    def replace(self, book_human, attrib):
+        """set the book (from its XML attributes, None if removed) of an alias
+
+        Previous books of the alias are forgotten so a rollback to one of them
+        (latest version deleted) is seen as an update"""
+        for book_core in self.cores.pop(book_human, set()):
+            self.forget(book_core)
+        if attrib is not None:
+            self.record(attrib)
+
     def has_book(self, book_core, book_human):
         return book_core in self.books.keys() or book_human in self.aliases.keys()
 
-    def is_update(self, entry):
-        if not self.has_book(entry["core"], to_human_alias(entry["relpath"])):
+    def is_update(self, entry: ZimEntry):
+        if not self.has_book(entry.core, to_human_alias(entry.relpath)):
             return False
-        return to_std_dict(entry) != self.books.get(entry["core"])
+        return to_std_fingerprint(entry) != self.books.get(entry.core)
+
+
+class LibraryJournal:
+    """Append-only JSONL journal of Library changes, for incremental consumers
+
+    Each line is an event with a sequence number (seq), increasing across runs.
+    Once over max_size, the journal is rotated to `<name>.<first seq>` and only
+    the `keep` most recent rotated segments are kept. Consumers get events
+    following the last seq they processed (their cursor) with read()."""
+
+    def __init__(
+        self,
+        fpath: pathlib.Path,
+        *,
+        max_size: int = Defaults.LIBRARY_JOURNAL_MAX_SIZE,
+        keep: int = Defaults.LIBRARY_JOURNAL_KEEP,
+    ):
+        self.fpath = fpath
+        self.max_size = max_size
+        self.keep = keep
+
+    @property
+    def segments(self) -> list[tuple[int, pathlib.Path]]:
+        """(first seq, path) of rotated segments, oldest first"""
+        prefix = f"{self.fpath.name}."
+        return sorted(
+            (int(fpath.name[len(prefix) :]), fpath)
+            for fpath in self.fpath.parent.glob(f"{self.fpath.name}.*")
+            if fpath.name[len(prefix) :].isdigit()
+        )
+
+    @property
+    def exists(self) -> bool:
+        """whether journal has been written (possibly all rotated)"""
+        return self.fpath.exists() or bool(self.segments)
+
+    @staticmethod
+    def read_events(fpath: pathlib.Path) -> Generator[dict, None, None]:
+        """events of a journal file, ignoring an incomplete (being written) line"""
+        try:
+            with open(fpath, "rb") as fh:
+                for line in fh:
+                    if not line.endswith(b"\n"):
+                        return
+                    yield json.loads(line)
+        except FileNotFoundError:
+            return
+
+    def get_last_seq(self) -> int:
+        """seq of the last event in journal (0 if empty)"""
+        for fpath in (self.fpath, *(fpath for _, fpath in reversed(self.segments))):
+            try:
+                with open(fpath, "rb") as fh:
+                    # events are small, last complete one is in the tail
+                    fh.seek(max(fh.seek(0, os.SEEK_END) - 2**16, 0))
+                    lines = fh.read().split(b"\n")[:-1]
+            except FileNotFoundError:
+                continue
+            if lines:
+                return json.loads(lines[-1])["seq"]
+        return 0
+
+    def append(self, events: list[dict[str, str]]):
+        """append events (numbered and timestamped), rotating if needed"""
+        if not events:
+            # created anyway so the journal is known written
+            if not self.exists:
+                with open_chmod(self.fpath, "ab", chmod=0o644):
+                    ...
+            return
+        seq = self.get_last_seq()
+        now = datetime.datetime.now(datetime.UTC)
+        data = "".join(
+            json.dumps({"seq": seq + index, "ts": now, **event}, cls=JSONEncoder) + "\n"
+            for index, event in enumerate(events, start=1)
+        ).encode("UTF-8")
+        with open_chmod(self.fpath, "a+b", chmod=0o644) as fh:
+            # drop incomplete line of an interrupted append
+            size = fh.seek(0, os.SEEK_END)
+            if size:
+                fh.seek(max(size - 2**16, 0))
+                tail = fh.read()
+                if not tail.endswith(b"\n"):
+                    fh.truncate(size - len(tail) + tail.rfind(b"\n") + 1)
+            fh.write(data)
+            fh.flush()
+            os.fsync(fh.fileno())
+            size = fh.tell()
+            fh.seek(0)
+            first_seq = json.loads(fh.readline())["seq"]
+
+        if size > self.max_size:
+            self.fpath.rename(self.fpath.with_name(f"{self.fpath.name}.{first_seq}"))
+            for _, fpath in self.segments[: -self.keep or None]:
+                fpath.unlink(missing_ok=True)
+
+    def read(self, cursor: int = 0) -> Generator[dict, None, None]:
+        """events with seq greater than cursor, oldest first
+
+        Raises ValueError if events following cursor were rotated away: consumer
+        has to start over from the full Library (and last seq)"""
+        fpaths = [*self.segments, (0, self.fpath)]
+        first_seq = fpaths[0][0] if len(fpaths) > 1 else 1
+        if cursor + 1 < first_seq:
+            raise ValueError(f"Journal events after {cursor} are not available")
+        # skip segments only holding events up to cursor
+        start = 0
+        for index, (segment_seq, _) in enumerate(fpaths[:-1]):
+            if segment_seq <= cursor + 1:
+                start = index
+        for _, fpath in fpaths[start:]:
+            for event in self.read_events(fpath):
+                if event["seq"] > cursor:
+                    yield event
 
 
 class LibraryMaintainer:
@@ -450,17 +2287,11 @@ class LibraryMaintainer:
         "purge-varnish",
     )
 
-    # former (old) filename format for ZIMs (period was MM_YYYY)
-    old_filename_fmt = re.compile(
-        r"^(?P<project>.+?_)(?P<lang>[a-z\-]{2,10}?_|)"
-        r"(?P<option>.+_|)(?P<month>[\d]{2}|)_(?P<year>[\d]{4})$",
-        re.IGNORECASE,
-    )
-    # current filename format for ZIMs (period is YYYY-MM)
-    filename_fmt = re.compile(
-        r"^(?P<project>.+?_)(?P<lang>[a-z\-]{2,10}?_|)"
-        r"(?P<option>.+_|)(?P<year>[\d]{4}|)\-(?P<month>[\d]{2})$",
-        re.IGNORECASE,
+    # actions performed on changes when watch is requested alone
+    WATCH_ACTIONS = (
+        "write-redirects",
+        "write-libraries",
+        "purge-varnish",
     )
 
     def __init__(
@@ -478,9 +2309,32 @@ class LibraryMaintainer:
         nb_zim_versions_to_keep: int,
         nb_zim_versions_exposed: int,
         varnish_urls: list[str],
+        varnish_purge_concurrency: int,
+        varnish_purge_batch_size: int,
+        library_compressions: str,
+        library_shards: str,
+        library_shards_dest: str,
+        opds_dest: str,
+        opds_root_url: str,
+        opds_page_size: int,
         log_to: str,
         dump_fs: str,
         load_fs: str,
+        revalidate: bool,
+        fs_fingerprint: str,
+        zim_cache: str,
+        workers: int,
+        mirrorbrain_hashed: str,
+        metrics_textfile: str,
+        metrics_json: str,
+        watch_debounce: float,
+        watch_rescan_interval: float,
+        zim_trash: str,
+        trash_reclaim_rate: int,
+        trash_truncate_step: int,
+        library_journal: str,
+        library_journal_max_size: int,
+        library_journal_keep: int,
     ):
         self.actions = [action.strip() for action in actions]
 
@@ -490,6 +2344,36 @@ class LibraryMaintainer:
 
         self.internal_zim_root = pathlib.Path(internal_zim_root)
         self.internal_library_dest = pathlib.Path(internal_library_dest)
+        self.library_compressions = []
+        for suffix in filter(None, map(str.strip, library_compressions.split(","))):
+            if suffix not in LIBRARY_COMPRESSION_MODULES:
+                raise ValueError(f"Unsupported library compression: {suffix}")
+            if LIBRARY_COMPRESSION_MODULES[suffix] is None:
+                logger.warning(f"[LIBS] No module for {suffix} compression, skipping")
+                continue
+            self.library_compressions.append(suffix)
+        self.library_shards = []
+        for kind in filter(None, map(str.strip, library_shards.split(","))):
+            if kind not in LIBRARY_SHARD_KINDS:
+                raise ValueError(f"Unsupported library shard kind: {kind}")
+            self.library_shards.append(kind)
+        self.library_shards_dest = (
+            pathlib.Path(library_shards_dest)
+            if library_shards_dest
+            else self.internal_library_dest.with_name("shards")
+        )
+        self.opds_dest = pathlib.Path(opds_dest) if opds_dest else None
+        self.opds_root_url = opds_root_url
+        self.opds_page_size = opds_page_size
+        self.library_journal = (
+            LibraryJournal(
+                pathlib.Path(library_journal),
+                max_size=library_journal_max_size,
+                keep=library_journal_keep,
+            )
+            if library_journal
+            else None
+        )
 
         # path the ZIM-redirects webserver consideres root (/)
         self.download_url_root = download_url_root
@@ -500,19 +2384,73 @@ class LibraryMaintainer:
         self.nb_zim_versions_exposed = nb_zim_versions_exposed
 
         self.varnish_urls = varnish_urls
+        self.varnish_purge_concurrency = varnish_purge_concurrency
+        self.varnish_purge_batch_size = varnish_purge_batch_size
+        self.purge_results: list[PurgeResult] = []
+        # purges that failed, to retry on next purge_varnish (watch)
+        self.pending_library_purge = False
+        self.pending_book_purges: dict[str, tuple[str, str]] = {}  # alias: (id, core)
 
         self.log_to = pathlib.Path(log_to) if log_to else None
         self.dump_fs = pathlib.Path(dump_fs) if dump_fs else None
         self.load_fs = pathlib.Path(load_fs) if load_fs else None
+        self.revalidate = revalidate
+        # relpath: (entry, mtime) from load_fs, to reuse in-ZIM info of unchanged ZIMs
+        self.snapshot_entries: dict[str, tuple[ZimEntry, int | None]] = {}
+        # relpath: mtime of ZIM files in all_zims (for snapshots)
+        self.zim_mtimes: dict[str, int] = {}
+        self.fs_fingerprint_path = (
+            pathlib.Path(fs_fingerprint) if fs_fingerprint else None
+        )
+        self.zim_cache_path = pathlib.Path(zim_cache) if zim_cache else None
+        self.zim_cache: ZimInfoCache | None = None
+        self.workers = workers
+        self.mirrorbrain_hashed_path = (
+            pathlib.Path(mirrorbrain_hashed) if mirrorbrain_hashed else None
+        )
+        # mirrorbrain paths (relative to redirects_root) known to have hashes
+        self.mirrorbrain_hashed: set[str] = set()
+        # nb of ZIM files excluded in this run as not yet ready on mirrorbrain
+        self.nb_not_mirrorbrain_ready = 0
 
-        # mapping of <core>: [<entry>, ] for ZIMs (entry is dict)
-        self.all_zims = {}
+        self.metrics_textfile = (
+            pathlib.Path(metrics_textfile) if metrics_textfile else None
+        )
+        self.metrics_json = pathlib.Path(metrics_json) if metrics_json else None
+        self.metrics = RunMetrics()
+
+        self.watch_debounce = watch_debounce
+        self.watch_rescan_interval = watch_rescan_interval
+
+        self.zim_trash = pathlib.Path(zim_trash) if zim_trash else None
+        # trash is on ZIM_ROOT's filesystem but must not be walked
+        if self.zim_trash and self.zim_trash.resolve().is_relative_to(
+            self.zim_root.resolve()
+        ):
+            relpath = self.zim_trash.resolve().relative_to(self.zim_root.resolve())
+            if self.with_hidden or not any(
+                is_excluded_name(part) for part in relpath.parts
+            ):
+                raise ValueError("ZIM trash within ZIM root must be hidden")
+        # moving to trash is a rename: fail now rather than after some ZIMs moved
+        if self.zim_trash and get_st_dev(self.zim_trash) != get_st_dev(self.zim_root):
+            raise ValueError("ZIM trash must be on ZIM root's filesystem")
+        self.trash_reclaim_rate = trash_reclaim_rate
+        self.trash_truncate_step = trash_truncate_step
+        self.trash_reclaimer: TrashReclaimer | None = None
+
+        # (folder, period-less name): most recent period for ZIM files on disk
+        self.latest_periods: dict[tuple[pathlib.Path, str], str] = {}
+
+        # mapping of <alias>: [<entry>, ] for ZIMs
+        self.all_zims: dict[str, list[ZimEntry]] = {}
 
         self.previous_lib: PreviousLib
+        self.pub_library_digest: str = ""
         self.updated_zims: dict[str, tuple[str, str]] = {}  # alias: (uuid, core)
 
     @property
-    def exposed_zims(self) -> dict[str, dict]:
+    def exposed_zims(self) -> dict[str, ZimEntry]:
         """alias: Entry of just the last entries for an alias"""
         return {alias: entries[0] for alias, entries in self.all_zims.items()}
 
@@ -527,154 +2465,322 @@ class LibraryMaintainer:
             )
 
     def read_zimfile_info(
-        self, fpath: pathlib.Path, *, read_zim: bool
-    ) -> dict[str, Any]:
+        self,
+        fpath: pathlib.Path,
+        *,
+        read_zim: bool,
+        stat: os.stat_result | None = None,
+    ) -> ZimEntry:
         """All infor read from ZIM file/name"""
-        entry = {}
         relpath = fpath.relative_to(self.zim_root)
 
+        parsed = parse_zim_filename(fpath.stem)
+        if not parsed.standard:
+            logger.error(f"[READ] Non-standard ZIM filename: {fpath.name}. Skipping")
+            raise ValueError("Non-standard ZIM filename")
+
+        stat = stat or fpath.stat()
+        entry = ZimEntry(
+            project=parsed.project,
+            lang=parsed.lang,
+            option=parsed.option,
+            month=parsed.month,
+            year=parsed.year,
+            core=parsed.core,
+            rsize=stat.st_size,
+            relpath=relpath,
+            url=str(f"{self.download_url_root}{relpath}.meta4"),
+            latest=bool(parsed.period)
+            and self.latest_periods.get((fpath.parent, parsed.name)) == parsed.period,
+        )
+
+        if read_zim:
+            self.read_zims_info([(entry, fpath, stat)])
+
+        return entry
+
+    def read_zims_info(
+        self, items: list[tuple[ZimEntry, pathlib.Path, os.stat_result]]
+    ):
+        """Updates entries in-place with in-ZIM info, from cache or ZIM files
+
+        ZIM files not in cache are read using a pool of `workers` processes"""
+        missing = []
+        for entry, fpath, stat in items:
+            info = self.zim_cache.get(entry.relpath, stat) if self.zim_cache else None
+            if info is None:
+                info = self.get_snapshot_info(entry, stat)
+                # keep cache up to date with info from snapshot
+                if info is not None and self.zim_cache:
+                    self.zim_cache.set(entry.relpath, stat, info)
+            if info is None:
+                missing.append((entry, fpath, stat))
+            else:
+                entry.update(info)
+
+        self.metrics.count("zims_opened", len(missing))
+        if not missing:
+            return
+
+        fpaths = [fpath for _, fpath, _ in missing]
+        if self.workers > 1 and len(missing) > 1:
+            logger.info(
+                f"[READ] Reading {len(missing)} ZIMs using {self.workers} workers"
+            )
+            with concurrent.futures.ProcessPoolExecutor(
+                max_workers=self.workers
+            ) as executor:
+                infos = list(executor.map(read_zim_metadata, fpaths))
+        else:
+            infos = map(read_zim_metadata, fpaths)
+
+        for (entry, _, stat), info in zip(missing, infos, strict=True):
+            entry.update(info)
+            if self.zim_cache:
+                self.zim_cache.set(entry.relpath, stat, info)
+
+    def get_snapshot_info(
+        self, entry: ZimEntry, stat: os.stat_result
+    ) -> dict[str, str] | None:
+        """in-ZIM info from revalidated load_fs if size and mtime are unchanged"""
+        previous, mtime = self.snapshot_entries.get(str(entry.relpath), (None, None))
+        if (
+            not previous
+            or not previous.id
+            or previous.rsize != stat.st_size
+            or mtime != stat.st_mtime_ns
+        ):
+            return None
+        self.metrics.count("zims_from_snapshot")
+        return previous.info()
+
+    def load_fs_data(self) -> bool:
+        """whether all_zims could be reloaded from load_fs snapshot or JSON file"""
+        logger.info(f"[READ] Attempting reload from {self.load_fs}")
         try:
-            values = self.filename_fmt.match(
-                fpath.stem
-            ).groupdict()  # pyright: ignore[reportOptionalMemberAccess]
-        except AttributeError:
-            try:
-                values = self.old_filename_fmt.match(
-                    fpath.stem
-                ).groupdict()  # pyright: ignore[reportOptionalMemberAccess]
-            except Exception as exc:
-                logger.error(
-                    f"[READ] Non-standard ZIM filename: {fpath.name}. Skipping"
+            with open(self.load_fs, "rb") as fh:  # pyright: ignore [reportArgumentType]
+                is_snapshot = fh.read(len(FS_SNAPSHOT_MAGIC)) == FS_SNAPSHOT_MAGIC
+            if is_snapshot:
+                self.all_zims, self.zim_mtimes = load_fs_snapshot(
+                    self.load_fs  # pyright: ignore [reportArgumentType]
                 )
-                raise ValueError("Non-standard ZIM filename") from exc
-
-        entry.update(
-            {
-                "project": values["project"][:-1],
-                "lang": values["lang"][:-1] if values.get("lang") else "en",
-                "option": values["option"][:-1] if values.get("option") else "",
-                "month": values["month"],
-                "year": values["year"],
-                "core": to_core(fpath),
-                "rsize": fpath.stat().st_size,
-                "relpath": relpath,
-                "size": str(int(fpath.stat().st_size / 1024)),
-                "url": str(f"{self.download_url_root}{relpath}.meta4"),
-                "latest": is_latest(fpath),
-            }
-        )
+                return True
+            with open(self.load_fs) as fh:  # pyright: ignore [reportArgumentType]
+                self.all_zims = json.load(fh, object_hook=zim_entry_hook)
+                return True
+        except Exception as exc:
+            logger.warning(
+                f"Unable to load fs data from {self.load_fs}. Reading filesystem"
+                f" -- {exc}"
+            )
+        return False
+
+    @contextmanager
+    def opened_zim_cache(self, *, prune: bool):
+        """zim_cache opened (if enabled) for the duration of the block
+
+        Entries not requested within the block are pruned if prune is set
+        and the block succeeded"""
+        if not self.zim_cache_path:
+            yield
+            return
+
+        logger.info(f"[READ] Using ZIM info cache at {self.zim_cache_path}")
+        self.zim_cache = ZimInfoCache(self.zim_cache_path)
+        succeeded = False
+        try:
+            yield
+            succeeded = True
+        finally:
+            logger.info(
+                f"[READ] > ZIM info cache: {self.zim_cache.nb_hits} hits, "
+                f"{self.zim_cache.nb_misses} misses"
+            )
+            self.metrics.count("zims_cached", self.zim_cache.nb_hits)
+            self.zim_cache.close(prune=prune and succeeded)
+            self.zim_cache = None
+
+    def add_zim_files(self, zim_files: list[pathlib.Path]):
+        """Adds entries for ZIM files to all_zims, marking updated ones
+
+        zim_files must be sorted (see sort_filenames_for_recent)"""
+
+        # filename-based info for all files (fast). in-ZIM info is read afterwards
+        # so it can be fetched from cache or read in parallel
+        entries: list[tuple[str, ZimEntry]] = []  # (alias, entry)
+        to_read: list[tuple[ZimEntry, pathlib.Path, os.stat_result]] = []
+        # alias: nb of entries
+        nb_entries = {alias: len(entries) for alias, entries in self.all_zims.items()}
+        for index, zim_path in enumerate(zim_files):
+            relpath = zim_path.relative_to(self.zim_root)
+            alias = to_human_alias(relpath)
+            logger.debug(f"[READ] {str(index).zfill(4)} {relpath}")
 
-        if not read_zim:
-            return entry
+            stat = zim_path.stat()
+            try:
+                entry = self.read_zimfile_info(zim_path, read_zim=False, stat=stat)
+            except ValueError:
+                continue
+            self.zim_mtimes[str(relpath)] = stat.st_mtime_ns
 
-        zim = Archive(fpath)
+            # only read in-zim data (slow) for the first n (1) files.
+            # we want to track all files so we can delete obsolete but deletion
+            # is only based on filename. ZIM-details only for latest comp.
+            # /!\ depends on iterator being sorted
+            if nb_entries.get(alias, 0) < self.nb_zim_versions_exposed:
+                to_read.append((entry, zim_path, stat))
+            nb_entries[alias] = nb_entries.get(alias, 0) + 1
+            entries.append((alias, entry))
 
-        entry.update(
-            {
-                "id": str(zim.uuid),
-                "mediaCount": str(zim.media_count),
-                "articleCount": str(zim.article_count),
-            }
-        )
+        self.read_zims_info(to_read)
 
-        for meta_name in NAMES_MAP.keys():  # noqa: PLC0206
-            try:
-                if meta_name == "Tags":
-                    entry[NAMES_MAP[meta_name]] = ";".join(zim.get_tags(libkiwix=True))
-                    continue
-                entry[NAMES_MAP[meta_name]] = zim.get_text_metadata(meta_name)
-            except RuntimeError:
-                if meta_name == "Title":
-                    entry[NAMES_MAP[meta_name]] = fpath.stem.replace("_", " ")
-                continue
-        if zim.has_illustration(48):
-            entry["favicon"] = base64.standard_b64encode(
-                zim.get_illustration_item(48).content
-            ).decode("ASCII")
+        for alias, entry in entries:
+            self.all_zims.setdefault(alias, []).append(entry)
 
-        return entry
+            # we had this book in previous lib but some metadata differ. mark updated
+            if entry.latest and self.previous_lib.is_update(entry):
+                logger.debug(f">> is update {alias}: {entry.id}")
+                self.updated_zims[alias] = (entry.id, entry.core)
+
+        # most recent first. files are sorted by core already but several cores
+        # (or folders) can share an alias so sort once all entries are in
+        for alias in {alias for alias, _ in entries}:
+            if len(self.all_zims[alias]) > 1:
+                self.all_zims[alias].sort(
+                    key=lambda e: f"{e.year}{e.month.zfill(2)}", reverse=True
+                )
 
     def readfs(self, *, restrict_to_mirrorbrain: bool = False):
         """walk filesystem for ZIM files to build self.all_zims
 
-        Optionnaly reads from load_fs JSON file.
-        Optionnaly dumps it to dump_fs JSON file."""
+        Optionnaly reads from load_fs snapshot or JSON file, as-is or only
+        reusing in-ZIM info for unchanged ZIMs (revalidate).
+        Optionnaly dumps it to dump_fs snapshot or JSON file (.json suffix).
+        Optionnaly reuses in-ZIM info from zim_cache for unchanged ZIMs."""
 
-        if self.load_fs:
-            logger.info(f"[READ] Attempting reload from {self.load_fs}")
-            try:
-                with open(self.load_fs) as fh:
-                    self.all_zims = json.load(fh, object_hook=pathlib_relpath)
-                    return
-            except Exception as exc:
-                logger.warning(
-                    f"Unable to load fs data from {self.load_fs}. Reading filesystem"
-                    f" -- {exc}"
-                )
+        if self.load_fs and self.load_fs_data():
+            if not self.revalidate:
+                return
+            # mtimes from snapshot (none from JSON) as zim_mtimes is refilled
+            self.snapshot_entries = {
+                str(entry.relpath): (entry, self.zim_mtimes.get(str(entry.relpath)))
+                for entries in self.all_zims.values()
+                for entry in entries
+            }
+            logger.info(
+                f"[READ] Revalidating {len(self.snapshot_entries)} entries from "
+                f"{self.load_fs}"
+            )
+            self.all_zims = {}
+            self.zim_mtimes = {}
 
         all_zim_files = get_zim_files(self.zim_root, with_hidden=self.with_hidden)
         all_zim_files = sort_filenames_for_recent(all_zim_files)  # consumes generator
+        self.latest_periods = get_latest_periods(all_zim_files)
 
         if restrict_to_mirrorbrain:
-            not_mb_ready = Mirrorbrain.get_not_ready_from(
-                all_zim_files,
-                # mirrorbrain works off a non-zim root (as for the redirects)
-                relative_to=self.redirects_root,
+            with self.metrics.phase("mirrorbrain"):
+                all_zim_files = self.exclude_not_mirrorbrain_ready(all_zim_files)
+            self.metrics.set(
+                "zims_not_mirrorbrain_ready", self.nb_not_mirrorbrain_ready
             )
-            # reduce list to matching ones
-            for path in not_mb_ready:
-                logger.warning(f"[MB] Excluding {path} (not in Mirrorbrain)")
-                all_zim_files.remove(path)
 
-        for index, zim_path in enumerate(all_zim_files):
-            relpath = zim_path.relative_to(self.zim_root)
-            alias = to_human_alias(relpath)
-            logger.debug(f"[READ] {str(index).zfill(4)} {relpath}")
+        with self.opened_zim_cache(prune=True):
+            self.add_zim_files(all_zim_files)
+        self.metrics.set(
+            "zims", sum(len(entries) for entries in self.all_zims.values())
+        )
+        self.metrics.set("aliases", len(self.all_zims))
 
-            try:
-                # only read in-zim data (slow) for the first n (1) files.
-                # we want to track all files so we can delete obsolete but deletion
-                # is only based on filename. ZIM-details only for latest comp.
-                # /!\ depends on iterator being sorted
-                entry = self.read_zimfile_info(
-                    zim_path,
-                    read_zim=len(self.all_zims.get(alias, []))
-                    < self.nb_zim_versions_exposed,
-                )
-            except ValueError:
-                continue
+        logger.debug(f"[READ] > {len(self.all_zims)} ZIM files in {self.zim_root}")
+        # only useful while reading
+        self.snapshot_entries = {}
 
-            if alias not in self.all_zims:
-                self.all_zims[alias] = [entry]
+        if self.dump_fs:
+            logger.info(f"[READ] Dumping filesystem data to {self.dump_fs}")
+            if self.dump_fs.suffix == ".json":
+                with open_chmod(self.dump_fs, "w", chmod=0o644) as fh:
+                    json.dump(self.all_zims, fh, indent=4, cls=JSONEncoder)
             else:
-                self.all_zims[alias].append(entry)
-                self.all_zims[alias].sort(
-                    key=lambda e: f'{e["year"]}{str(e["month"]).zfill(2)}', reverse=True
-                )
+                dump_fs_snapshot(self.dump_fs, self.all_zims, self.zim_mtimes)
 
-            # we had this book in previous lib but some metadata differ. mark updated
-            if entry["latest"] and self.previous_lib.is_update(entry):
-                logger.debug(f">> is update {alias}: {entry['id']}")
-                self.updated_zims[alias] = (entry["id"], entry["core"])
+    def is_walked(self, fpath: pathlib.Path) -> bool:
+        """whether fpath is a ZIM file get_zim_files would return"""
+        try:
+            relpath = fpath.relative_to(self.zim_root)
+        except ValueError:
+            return False
+        return (
+            fpath.suffix == ".zim"
+            and fpath.is_file()
+            and not is_excluded_name(fpath.name)
+            and (
+                self.with_hidden
+                or not any(is_excluded_name(part) for part in relpath.parts[:-1])
+            )
+            and not fpath.with_suffix(".delete").exists()
+        )
 
-        logger.debug(f"[READ] > {len(self.all_zims)} ZIM files in {self.zim_root}")
+    def refresh_zim_files(self, fpaths: set[pathlib.Path]):
+        """Updates all_zims for aliases affected by changes to fpaths
 
-        if self.dump_fs:
-            logger.info(f"[READ] Dumping filesystem data to {self.dump_fs}")
-            with open_chmod(self.dump_fs, "w", chmod=0o644) as fh:
-                json.dump(self.all_zims, fh, indent=4, cls=JSONEncoder)
+        Entries for those aliases are rebuilt from their known files and changed
+        ones. updated_zims is reset to those updated in this refresh."""
+
+        # .delete markers apply to their sibling ZIM
+        changed = {fpath.with_suffix(".zim") for fpath in fpaths}
+        aliases = {to_human_alias(fpath) for fpath in changed}
+        candidates = set(changed)
+        for alias in aliases:
+            candidates.update(
+                self.zim_root.joinpath(entry.relpath)
+                for entry in self.all_zims.get(alias, [])
+            )
+            # emptied (not removed) to keep its position in library
+            self.all_zims[alias] = []
+        zim_files = sort_filenames_for_recent(filter(self.is_walked, candidates))
+
+        for fpath in candidates:
+            self.latest_periods.pop(
+                (fpath.parent, parse_zim_filename(fpath.stem).name), None
+            )
+        self.latest_periods.update(get_latest_periods(zim_files))
+
+        self.updated_zims = {}
+        with self.opened_zim_cache(prune=False):
+            self.add_zim_files(zim_files)
+
+        for alias in aliases:
+            if not self.all_zims[alias]:
+                del self.all_zims[alias]
+        logger.info(
+            f"[WATCH] > {len(zim_files)} ZIM files for {len(aliases)} aliases, "
+            f"{len(self.all_zims)} aliases total"
+        )
+        return aliases
 
     @property
     def obsolete_zim_files(self):
         for entries in self.all_zims.values():
             for entry in entries[self.nb_zim_versions_to_keep :]:
-                yield self.zim_root / entry["relpath"]
+                yield self.zim_root / entry.relpath
 
     def delete_outdated(self):
-        """Delete non-last (see nb_zim_versions_to_keep) ZIM files from filesystem"""
+        """Delete non-last (see nb_zim_versions_to_keep) ZIM files from filesystem
+
+        With zim_trash, files are moved to trash (instant for readers) and
+        reclaimed in the background (see TrashReclaimer)"""
 
         def delete_file(fpath):
-            fpath.unlink()
+            if not self.zim_trash:
+                fpath.unlink()
+                return
+            target = self.zim_trash / fpath.relative_to(self.zim_root)
+            if target.exists():
+                target = target.with_name(f"{target.name}.{time.time_ns()}")
+            target.parent.mkdir(parents=True, exist_ok=True)
+            # same filesystem (checked on init): atomic
+            fpath.rename(target)
 
         logger.info("[DELETE] removing obsolete ZIMs")
         nb_deleted = deleted_size = 0
@@ -686,9 +2792,35 @@ class LibraryMaintainer:
 
             nb_deleted += 1
             deleted_size += size
+            self.metrics.count("zims_deleted")
         logger.info(
             f"[DELETE] removed {nb_deleted} files, saving {human_size(deleted_size)}"
         )
+        if self.zim_trash:
+            self.start_trash_reclaim()
+
+    def start_trash_reclaim(self):
+        """reclaim zim_trash in the background unless already reclaiming"""
+        if self.trash_reclaimer and self.trash_reclaimer.is_alive():
+            return
+        self.wait_for_trash_reclaim()
+        self.trash_reclaimer = TrashReclaimer(
+            self.zim_trash,  # pyright: ignore [reportArgumentType]
+            rate=self.trash_reclaim_rate,
+            truncate_step=self.trash_truncate_step,
+        )
+        self.trash_reclaimer.start()
+
+    def wait_for_trash_reclaim(self):
+        """wait for background trash reclaim (if any) to complete"""
+        if not self.trash_reclaimer:
+            return
+        if self.trash_reclaimer.is_alive():
+            logger.info("[TRASH] Waiting for trash reclaim to complete")
+        self.trash_reclaimer.join()
+        self.metrics.count("trash_reclaimed_files", self.trash_reclaimer.nb_reclaimed)
+        self.metrics.count("trash_reclaimed_bytes", self.trash_reclaimer.reclaimed_size)
+        self.trash_reclaimer = None
 
     def write_zim_redirects_map(self):
         """Writes map file of redirects for ZIM files (no-period to last, no folder)
@@ -697,133 +2829,386 @@ class LibraryMaintainer:
         paths to point to the last matching ZIM file (and companion files)"""
 
         logger.info(f"[REDIR] Writting ZIM redirects to {self.zim_redirects_map}")
-        # no-period redirects for content
-        content = ""
+        suffixes = ("", ".torrent", ".meta4", ".magnet", ".md5", ".sha256")
         prefix = self.zim_root.relative_to(self.redirects_root)
+        # computed once as exposed_zims is rebuilt on each access
+        exposed_zims = self.exposed_zims
+        aliases = set(exposed_zims.keys())
+        counts = {"direct": 0, "all": 0, "novid": 0, "nodet": 0}
+
+        map_tmp = get_tmp(self.zim_redirects_map)
+        with open_chmod(map_tmp, "w", chmod=0o644) as fh:
+
+            def add_entry(kind: str, ident: str, relpath: pathlib.Path):
+                # no-period redirects for content
+                fh.writelines(
+                    f"/{prefix}/{ident}.zim{suffix} /{relpath}{suffix}\n"
+                    for suffix in suffixes
+                )
+                counts[kind] += 1
+
+            for entry in exposed_zims.values():
+                relpath = self.zim_root.joinpath(entry.relpath).relative_to(
+                    self.redirects_root
+                )
+                ident = parse_zim_filename(relpath.stem).name
+                add_entry("direct", ident, relpath)
 
-        def add_entry(ident, relpath):
-            nonlocal content, prefix
-            for suffix in ("", ".torrent", ".meta4", ".magnet", ".md5", ".sha256"):
-                content += f"/{prefix}/{ident}.zim{suffix} /{relpath}{suffix}\n"
+                # [BACKWARD COMPATIBILITY] Redirect _all to _all_maxi if no _all
+                all_ident = ident.replace("_maxi", "")
+                if all_ident not in aliases:
+                    add_entry("all", all_ident, relpath)
 
-        for entry in self.exposed_zims.values():
-            relpath = self.zim_root.joinpath(entry["relpath"]).relative_to(
-                self.redirects_root
-            )
-            ident = without_period(relpath.stem)
-            add_entry(ident, relpath)
+                # [BACKWARD COMPATIBILITY] Redirect _novid to _maxi if no _novid
+                novid_ident = ident.replace("_maxi", "_novid")
+                if novid_ident not in aliases:
+                    add_entry("novid", novid_ident, relpath)
 
-            # [BACKWARD COMPATIBILITY] Redirect _all to _all_maxi if _all does not exist
-            all_ident = ident.replace("_maxi", "")
-            if all_ident not in self.exposed_zims.keys():
-                add_entry(all_ident, relpath)
+                # [BACKWARD COMPATIBILITY] Redirect _nodet to _mini if no _nodet
+                nodet_ident = ident.replace("_mini", "_nodet")
+                if nodet_ident not in aliases:
+                    add_entry("nodet", nodet_ident, relpath)
 
-            # [BACKWARD COMPATIBILITY] Redirect _novid to _maxi if _novid does not exist
-            novid_ident = ident.replace("_maxi", "_novid")
-            if novid_ident not in self.exposed_zims.keys():
-                add_entry(novid_ident, relpath)
+        try:
+            swap(map_tmp, self.zim_redirects_map)
+        except OSError:
+            # map might be a single-file mount (can't be replaced), or another fs
+            shutil.copyfile(map_tmp, self.zim_redirects_map)
+            map_tmp.unlink()
 
-            # [BACKWARD COMPATIBILITY] Redirect _nodet to _mini if _nodet does not exist
-            nodet_ident = ident.replace("_mini", "_nodet")
-            if nodet_ident not in self.exposed_zims.keys():
-                add_entry(nodet_ident, relpath)
+        self.metrics.set("redirects", sum(counts.values()) * len(suffixes))
+        logger.info(
+            f"[REDIR] > OK. Wrote {sum(counts.values()) * len(suffixes)} redirects "
+            f"for {sum(counts.values())} idents ("
+            + ", ".join(f"{kind}: {count}" for kind, count in counts.items())
+            + ")"
+        )
 
-        with open_chmod(self.zim_redirects_map, "w", chmod=0o644) as fh:
-            fh.write(content)
+    def write_libraries(self):
+        """Writes Public and Internal (with path attrib) XML Libraries from all_zims
 
-        logger.info(f"[REDIR] > OK. Wrote {len(content.splitlines()) -1 } redirects")
+        Both are written in a single pass over exposed_zims, which also assigns
+        books to Internal Library shards (if requested)"""
 
-    def write_public_library(self):
-        """Writes the Public (without path attrib) XML Library from all_zims"""
+        logger.info(
+            f"[LIBS] Preparing Public library for {self.pub_library_dest} "
+            f"and Internal library for {self.internal_library_dest}"
+        )
 
-        logger.info(f"[LIBS] Preparing Public library for {self.pub_library_dest}")
+        with write_library(
+            self.pub_library_dest, self.library_compressions
+        ) as pub_library, write_library(self.internal_library_dest) as int_library:
+            # (kind, name): entries
+            shards: dict[tuple[str, str], list[ZimEntry]] = {}
+            for entry in self.exposed_zims.values():
+                elem = to_book_element(entry)
+                pub_library.add_book(elem)
+                # internal library path is relative download path prefixed
+                # with internal_zim_root
+                elem.set("path", f"{self.internal_zim_root}/{entry.relpath}")
+                int_library.add_book(elem)
+                for kind in self.library_shards:
+                    for name in to_shard_names(entry, kind):
+                        shards.setdefault((kind, name), []).append(entry)
+            logger.info(
+                f"[LIBS] Libraries successfuly generated with {pub_library.nb_books} "
+                f"books ({human_size(pub_library.size)}). Swaping files…"
+            )
 
-        pub_library_tmp = get_tmp(self.pub_library_dest)
-        with open_chmod(pub_library_tmp, "wb", chmod=0o644) as fh:
-            fh.write(
-                b'<?xml version="1.0" encoding="UTF-8" ?>\n'
-                b'<library version="20110515">\n'
+        logger.info(f"[LIBS] > done. Public Library sha256: {pub_library.hexdigest}")
+        if pub_library.variants:
+            logger.info(
+                "[LIBS] > Public Library variants: "
+                + ", ".join(
+                    f"{variant.fpath.name} ({human_size(variant.size)})"
+                    for variant in pub_library.variants
+                )
             )
-            for entry in self.exposed_zims.values():
-                elem = etree.Element("book")
-                for attr in COPIED_KEYS:
-                    if entry.get(attr):
-                        elem.set(attr, entry.get(attr))
-                    elem.set("faviconMimeType", "image/png")
-                assert elem.get("id")  # safeguard that we dont write entry without data
-                fh.write(etree.tostring(elem, encoding="UTF-8"))
-                fh.write(b"\n")
-            fh.write(b"</library>\n")
-
-        logger.info("[LIBS] Public Library successfuly generated. Verifying XML…")
-        assert parseable_xml_file(pub_library_tmp)
-        logger.info("[LIBS] Public XML is well formed. Swaping files…")
-        swap(pub_library_tmp, self.pub_library_dest)
-        logger.info("[LIBS] > done.")
-
-    def write_internal_library(self):
-        """Writes Internal (with path attrib) XML Library from Public Library"""
-        convert_pub_library_to_internal(
-            pub_library_dest=self.pub_library_dest,
-            internal_library_dest=self.internal_library_dest,
-            download_url_root=self.download_url_root,
-            internal_zim_root=self.internal_zim_root,
+        self.pub_library_digest = pub_library.hexdigest
+        self.metrics.set("library_books", pub_library.nb_books)
+        self.metrics.set("library_bytes", pub_library.size)
+        if pub_library.hexdigest == pub_library.previous_hexdigest:
+            logger.info("[LIBS] > Public Library is identical to previous one")
+
+        if self.library_journal:
+            self.journal_library_changes(self.library_journal)
+
+        if self.library_shards:
+            self.write_library_shards(shards)
+
+        if self.opds_dest:
+            self.write_opds_catalog()
+
+    def journal_library_changes(self, journal: LibraryJournal):
+        """Appends Public Library changes since previous_lib to journal
+
+        Books are added (new alias), updated (new version or metadata changes) or
+        removed (alias not exposed anymore). Removed books are forgotten from
+        previous_lib so next changes (watch) compare to the written library"""
+        if not self.previous_lib.read:
+            logger.warning("[LIBS] No previous Library to compare to. Not journaling")
+            return
+
+        exposed_zims = self.exposed_zims
+        events = []
+        for alias, entry in exposed_zims.items():
+            if not self.previous_lib.has_book(entry.core, alias):
+                event = "added"
+            elif self.previous_lib.is_update(entry):
+                event = "updated"
+            else:
+                continue
+            events.append(
+                {
+                    "event": event,
+                    "uuid": entry.id,
+                    "core": entry.core,
+                    "alias": alias,
+                    "relpath": str(entry.relpath),
+                    "size": entry.size,
+                }
+            )
+        for core, (book_id, url, size) in list(self.previous_lib.infos.items()):
+            alias = to_human_alias(fname_from_url(url))
+            if alias in exposed_zims:
+                continue
+            events.append(
+                {
+                    "event": "removed",
+                    "uuid": book_id,
+                    "core": core,
+                    "alias": alias,
+                    "relpath": url.removeprefix(self.download_url_root).removesuffix(
+                        ".meta4"
+                    ),
+                    "size": size,
+                }
+            )
+            self.previous_lib.forget(core)
+
+        journal.append(events)
+        self.metrics.count("journal_events", len(events))
+        logger.info(f"[LIBS] > Journaled {len(events)} changes to {journal.fpath}")
+
+    def write_opds_catalog(self):
+        """Writes static OPDS catalog for exposed_zims to opds_dest"""
+        logger.info(f"[LIBS] Writing static OPDS catalog to {self.opds_dest}")
+        writer = OpdsCatalogWriter(
+            self.opds_dest,  # pyright: ignore [reportArgumentType]
+            root_url=self.opds_root_url,
+            page_size=self.opds_page_size,
+            compressions=self.library_compressions,
         )
+        writer.write_catalog(list(self.exposed_zims.values()))
+        self.metrics.set("opds_documents", writer.nb_documents)
+        logger.info(f"[LIBS] > done. Wrote {writer.nb_documents} OPDS documents")
+
+    def write_library_shards(self, shards: dict[tuple[str, str], list[ZimEntry]]):
+        """Writes Internal Library shards and their manifest to library_shards_dest
+
+        Shards are at <kind>/<name>.xml. Shards from the previous manifest that
+        are not written anymore are removed."""
+        logger.info(
+            f"[LIBS] Writing {len(shards)} Internal Library shards "
+            f"({', '.join(self.library_shards)}) to {self.library_shards_dest}"
+        )
+        manifest_fpath = self.library_shards_dest / LIBRARY_SHARDS_MANIFEST
+        try:
+            previous = json.loads(manifest_fpath.read_text())["shards"]
+        except Exception:
+            previous = {}
+
+        manifest: dict[str, dict[str, dict[str, Any]]] = {}
+        for (kind, name), entries in sorted(shards.items()):
+            fpath = self.library_shards_dest / kind / f"{name}.xml"
+            fpath.parent.mkdir(parents=True, exist_ok=True)
+            with write_library(fpath) as shard:
+                for entry in entries:
+                    elem = to_book_element(entry)
+                    elem.set("path", f"{self.internal_zim_root}/{entry.relpath}")
+                    shard.add_book(elem)
+            manifest.setdefault(kind, {})[name] = {
+                "path": str(fpath.relative_to(self.library_shards_dest)),
+                "books": shard.nb_books,
+                "size": shard.size,
+                "sha256": shard.hexdigest,
+            }
+            self.metrics.count("library_shards")
+
+        for kind, kind_shards in previous.items():
+            for name, info in kind_shards.items():
+                if name in manifest.get(kind, {}):
+                    continue
+                fpath = self.library_shards_dest / info["path"]
+                logger.info(f"[LIBS] > removing stale shard {fpath}")
+                for suffix in ("", "sha256", "idx", *LIBRARY_COMPRESSION_MODULES):
+                    fpath.with_name(
+                        f"{fpath.name}.{suffix}" if suffix else fpath.name
+                    ).unlink(missing_ok=True)
+
+        tmp = get_tmp(manifest_fpath)
+        with open_chmod(tmp, "w", chmod=0o644) as fh:
+            json.dump(
+                {
+                    "generated_on": datetime.datetime.now(datetime.UTC),
+                    "library": self.internal_library_dest.name,
+                    "shards": manifest,
+                },
+                fh,
+                indent=4,
+                cls=JSONEncoder,
+            )
+        swap(tmp, manifest_fpath)
+        logger.info(f"[LIBS] > done. Shards manifest at {manifest_fpath}")
 
     def purge_varnish(self):
-        """Request varnish cache to expire updated Books and Paths"""
-        if not self.updated_zims:
+        """Request varnish cache to expire updated Books and Paths
+
+        Failed purges are logged and kept in pending_* to be retried on next call
+        instead of failing once libraries are written"""
+        books = {**self.pending_book_purges, **self.updated_zims}
+        if not books and not self.pending_library_purge:
             logger.info("[PURGE] No updated ZIM in Library, not purging.")
             return
+        if self.pending_book_purges or self.pending_library_purge:
+            logger.info(
+                f"[PURGE] Retrying {len(self.pending_book_purges)} failed Books purge"
+                + (" and failed Library purge" if self.pending_library_purge else "")
+            )
 
-        for varnish_url in self.varnish_urls:
+        purger = VarnishPurger(
+            self.varnish_urls,
+            concurrency=self.varnish_purge_concurrency,
+            batch_size=self.varnish_purge_batch_size,
+        )
+        started_on = time.monotonic()
+        time.sleep(VARNISH_PURGE_DELAY)
+        try:
             # purge library (once)
-            logger.info(f"[PURGE] Requesting Library purge from {varnish_url}")
-            time.sleep(10)
-            resp = requests.request(
-                method="PURGE",
-                url=varnish_url,
-                headers={"X-Purge-Type": "library"},
-                timeout=VARNISH_PURGE_HTTP_TIMEOUT,
-            )
-            if not resp.ok:
-                logger.error(f"[PURGE] > HTTP {resp.status_code}/{resp.reason}")
-
-            logger.info("[PURGE] Requesting Books purge for")
-            for book_alias in self.updated_zims.keys():
-                book_id, book_core = self.updated_zims[book_alias]
-                logger.debug(f"[PURGE] > {book_alias} / {book_core} / {book_id}")
-                resp = requests.request(
-                    method="PURGE",
-                    url=varnish_url,
-                    headers={
-                        "X-Purge-Type": "book",
-                        "X-Book-Id": book_id,
-                        "X-Book-Name": book_core,
-                        # only account for new-style book name fmt (yolo)
-                        "X-Book-Name-Nodate": book_alias,
-                    },
-                    timeout=VARNISH_PURGE_HTTP_TIMEOUT,
-                )
-                if not resp.ok:
-                    logger.error(f"[PURGE] >> HTTP {resp.status_code}/{resp.reason}")
+            logger.info(f"[PURGE] Requesting Library purge from {self.varnish_urls}")
+            purger.purge_library()
+
+            logger.info(f"[PURGE] Requesting {len(books)} Books purge")
+            purger.purge_books(books)
 
             # no mandate to purge kiwix-serve
-            # resp = requests.request(
-            #     method="PURGE",
-            #     url=varnish_url,
-            #     headers={"X-Purge-Type": "kiwix-serve"},
+            # purger.dispatch(
+            #     [(url, "kiwix-serve", "kiwix-serve", {}) for url in self.varnish_urls]
             # )
+        finally:
+            purger.close()
+
+        purger.log_summary()
+        logger.info(f"[PURGE] > done in {time.monotonic() - started_on:.3f}s")
+        self.purge_results = purger.results
+        durations = [res.duration for res in purger.results]
+        self.metrics.set("purge_requests", len(purger.results))
+        self.metrics.set("purge_errors", len(purger.failed))
+        self.metrics.set("purge_latency_seconds_sum", sum(durations))
+        self.metrics.set("purge_latency_seconds_max", max(durations, default=0))
+
+        self.pending_library_purge = any(
+            res.purge_type == "library" for res in purger.failed
+        )
+        self.pending_book_purges = {
+            alias: books[alias] for res in purger.failed for alias in res.aliases
+        }
+        if self.pending_library_purge or self.pending_book_purges:
+            logger.error(
+                f"[PURGE] > {len(self.pending_book_purges)} Books"
+                + (" and Library" if self.pending_library_purge else "")
+                + " purges pending"
+            )
 
-    def filter_zims_to_mirrorbrain_ready_only(self):
+    def exclude_not_mirrorbrain_ready(
+        self, zim_paths: list[pathlib.Path]
+    ) -> list[pathlib.Path]:
+        """copy of supplied list without paths that dont have hashes on mirrorbrain"""
+        self.load_mirrorbrain_hashed()
+        not_mb_ready = self.get_not_mirrorbrain_ready(zim_paths)
+        self.nb_not_mirrorbrain_ready = len(not_mb_ready)
+        self.save_mirrorbrain_hashed(zim_paths)
+        # reduce list to matching ones
+        for path in not_mb_ready:
+            logger.warning(f"[MB] Excluding {path} (not in Mirrorbrain)")
+        excluded = set(not_mb_ready)
+        return [path for path in zim_paths if path not in excluded]
+
+    def load_mirrorbrain_hashed(self):
+        """read paths known to have hashes on mirrorbrain from previous runs"""
+        if not self.mirrorbrain_hashed_path:
+            return
+        try:
+            self.mirrorbrain_hashed = set(
+                self.mirrorbrain_hashed_path.read_text().splitlines()
+            )
+        except FileNotFoundError:
+            self.mirrorbrain_hashed = set()
+        except Exception as exc:
+            logger.warning(
+                f"[MB] Unable to read hashed paths from {self.mirrorbrain_hashed_path}"
+                f" -- {exc}"
+            )
+            self.mirrorbrain_hashed = set()
+        logger.info(
+            f"[MB] {len(self.mirrorbrain_hashed)} paths known to have hashes "
+            "from previous runs"
+        )
+
+    def save_mirrorbrain_hashed(self, zim_paths: list[pathlib.Path]):
+        """record paths known to have hashes on mirrorbrain, for those still on fs"""
+        if not self.mirrorbrain_hashed_path:
+            return
+        existing = {str(path.relative_to(self.redirects_root)) for path in zim_paths}
+        self.mirrorbrain_hashed &= existing
+        tmp = get_tmp(self.mirrorbrain_hashed_path)
+        with open_chmod(tmp, "w", chmod=0o644) as fh:
+            for relpath in sorted(self.mirrorbrain_hashed):
+                fh.write(f"{relpath}\n")
+        swap(tmp, self.mirrorbrain_hashed_path)
+
+    def get_not_mirrorbrain_ready(
+        self, zim_paths: list[pathlib.Path]
+    ) -> list[pathlib.Path]:
+        """paths from supplied list that dont have hashes on mirrorbrain
+
+        Mirrorbrain is only queried for paths not known to have hashes already
+        (hashes are never removed once computed)"""
+
+        def mb_path(zim_path: pathlib.Path) -> str:
+            # mirrorbrain works off a non-zim root (as for the redirects)
+            return str(zim_path.relative_to(self.redirects_root))
+
+        unknown = [
+            path for path in zim_paths if mb_path(path) not in self.mirrorbrain_hashed
+        ]
+        logger.info(
+            f"[MB] Querying Mirrorbrain for {len(unknown)}/{len(zim_paths)} paths"
+        )
         not_ready = Mirrorbrain.get_not_ready_from(
+            unknown, relative_to=self.redirects_root
+        )
+        not_ready_ = set(not_ready)
+        self.mirrorbrain_hashed.update(
+            mb_path(path) for path in unknown if path not in not_ready_
+        )
+        return not_ready
+
+    def filter_zims_to_mirrorbrain_ready_only(self):
+        self.load_mirrorbrain_hashed()
+        not_ready = self.get_not_mirrorbrain_ready(
             # all_zims is a sorted list with first being latest for an alias
             [
-                self.zim_root.joinpath(entries[0]["relpath"])
+                self.zim_root.joinpath(entries[0].relpath)
                 for entries in self.all_zims.values()
             ],
-            # mirrorbrain works off a non-zim root (as for the redirects)
-            relative_to=self.redirects_root,
+        )
+        self.save_mirrorbrain_hashed(
+            [
+                self.zim_root.joinpath(entry.relpath)
+                for entries in self.all_zims.values()
+                for entry in entries
+            ]
         )
         for zim_path in not_ready:
             relpath = zim_path.relative_to(self.zim_root)
@@ -837,12 +3222,79 @@ class LibraryMaintainer:
                     ...
             else:
                 for entry in list(self.all_zims[alias]):
-                    if entry["relpath"] == relpath:
+                    if entry.relpath == relpath:
                         self.all_zims[alias].remove(entry)
 
+    def get_fingerprint(self) -> str:
+        """fingerprint of ZIM_ROOT folders and of what's requested from this run
+
+        Empty if fingerprinting is disabled or not applicable (load_fs)"""
+        if not self.fs_fingerprint_path or self.load_fs:
+            return ""
+        logger.info(f"[READ] Computing filesystem fingerprint for {self.zim_root}")
+        digest = hashlib.sha256(
+            get_fs_fingerprint(self.zim_root, with_hidden=self.with_hidden).encode()
+        )
+        # a change in the requested actions or options must not be short-circuited
+        digest.update("\0".join(sys.argv[1:]).encode())
+        return digest.hexdigest()
+
+    def is_unchanged_since_last_run(self, fingerprint: str) -> bool:
+        """whether fingerprint matches the one of the last complete run
+
+        Also requires the outputs of this run's actions to be present"""
+        try:
+            previous = self.fs_fingerprint_path.read_text().strip()  # pyright: ignore
+        except Exception:
+            return False
+        outputs = []
+        if "write-redirects" in self.actions:
+            outputs.append(self.zim_redirects_map)
+        if "write-libraries" in self.actions:
+            for fpath in (self.pub_library_dest, self.internal_library_dest):
+                outputs += [
+                    fpath,
+                    fpath.with_name(f"{fpath.name}.idx"),
+                    fpath.with_name(f"{fpath.name}.sha256"),
+                ]
+            outputs += [
+                self.pub_library_dest.with_name(
+                    f"{self.pub_library_dest.name}.{suffix}"
+                )
+                for suffix in self.library_compressions
+            ]
+            if self.library_shards:
+                outputs.append(self.library_shards_dest / LIBRARY_SHARDS_MANIFEST)
+            if self.opds_dest:
+                outputs.append(self.opds_dest / "root.xml")
+            if self.library_journal and not self.library_journal.exists:
+                return False
+        return previous == fingerprint and all(fpath.exists() for fpath in outputs)
+
+    def save_fingerprint(self, fingerprint: str):
+        if not fingerprint:
+            return
+        if self.nb_not_mirrorbrain_ready:
+            # ZIMs excluded in this run should be reconsidered on next one
+            logger.info("[READ] Some ZIMs not ready on Mirrorbrain, not fingerprinting")
+            return
+        tmp = get_tmp(self.fs_fingerprint_path)  # pyright: ignore
+        with open_chmod(tmp, "w", chmod=0o644) as fh:
+            fh.write(f"{fingerprint}\n")
+        swap(tmp, self.fs_fingerprint_path)  # pyright: ignore
+
     def run(self):
         restrict_to_mirrorbrain = False
 
+        watch = "watch" in self.actions
+        if watch:
+            if "all" in self.actions:
+                logger.error("watch cannot be combined with all")
+                return 1
+            self.actions = [
+                action for action in self.actions if action != "watch"
+            ] or list(self.WATCH_ACTIONS)
+
         if "all" in self.actions:
             self.actions = self.ACTIONS
             restrict_to_mirrorbrain = True
@@ -854,31 +3306,170 @@ class LibraryMaintainer:
 
         logger.info(f"Starting library-maint for {', '.join(self.actions)}")
 
-        if restrict_to_mirrorbrain:
-            Mirrorbrain.ensure_connected()
+        if watch:
+            return self.watch()
+
+        succeeded = False
+        try:
+            with self.metrics.phase("fingerprint"):
+                fingerprint = self.get_fingerprint()
+            if fingerprint and self.is_unchanged_since_last_run(fingerprint):
+                logger.info("[READ] > Filesystem unchanged since last run. Exiting.")
+                succeeded = True
+                return
+
+            if restrict_to_mirrorbrain:
+                Mirrorbrain.ensure_connected()
+
+            with self.metrics.phase("load_previous_library"):
+                self.load_previous_library()
+
+            # always read source data
+            with self.metrics.phase("readfs"):
+                self.readfs(restrict_to_mirrorbrain=restrict_to_mirrorbrain)
+            if not len(self.all_zims):
+                return 1
+
+            self.apply_actions()
 
-        self.load_previous_library()
+            # pending purges are only retried in watch mode
+            if self.pending_library_purge or self.pending_book_purges:
+                return 1
 
-        # always read source data
-        self.readfs(restrict_to_mirrorbrain=restrict_to_mirrorbrain)
-        if not len(self.all_zims):
-            return 1
+            self.save_fingerprint(fingerprint)
+            succeeded = True
+        finally:
+            self.wait_for_trash_reclaim()
+            self.write_metrics(succeeded=succeeded)
 
+    def apply_actions(self):
+        """perform requested actions on all_zims"""
         if "delete-zim" in self.actions:
-            self.delete_outdated()
+            with self.metrics.phase("delete_outdated"):
+                self.delete_outdated()
 
         if "write-redirects" in self.actions:
-            self.write_zim_redirects_map()
+            with self.metrics.phase("write_zim_redirects_map"):
+                self.write_zim_redirects_map()
 
         if "write-libraries" in self.actions:
-            self.write_public_library()
-            self.write_internal_library()
+            with self.metrics.phase("write_libraries"):
+                self.write_libraries()
 
         if "purge-varnish" in self.actions:
-            self.purge_varnish()
+            with self.metrics.phase("purge_varnish"):
+                self.purge_varnish()
+
+    def write_metrics(self, *, succeeded: bool):
+        """export metrics of this run (or watch iteration), if requested"""
+        for fpath, write in (
+            (self.metrics_textfile, self.metrics.write_textfile),
+            (self.metrics_json, self.metrics.write_json),
+        ):
+            if not fpath:
+                continue
+            try:
+                write(fpath, succeeded=succeeded)
+            except Exception as exc:
+                logger.warning(f"Unable to write metrics to {fpath} -- {exc}")
+
+    def wait_for_changes(
+        self, inotify: Inotify, timeout: float
+    ) -> tuple[set[pathlib.Path], bool]:
+        """(changed ZIM or .delete paths, whether a full rescan is required)
+
+        Waits up to timeout for a first event then collects events until none
+        is received for watch_debounce seconds (bursts are handled at once)"""
+        fpaths: set[pathlib.Path] = set()
+        rescan = False
+        started_on = time.monotonic()
+        events = inotify.read_events(timeout)
+        while events:
+            for fpath, mask in events:
+                if fpath is None:
+                    logger.warning("[WATCH] inotify queue overflowed")
+                    rescan = True
+                elif mask & Inotify.IN_ISDIR:
+                    # folder added, moved or removed: content is unknown
+                    if mask & (Inotify.IN_CREATE | Inotify.IN_MOVED_TO) and (
+                        self.with_hidden or not is_excluded_name(fpath.name)
+                    ):
+                        inotify.add_tree(fpath, with_hidden=self.with_hidden)
+                    rescan = True
+                elif mask & Inotify.IN_CREATE:
+                    # file is being written. will be handled once closed
+                    continue
+                elif fpath.suffix in (".zim", ".delete"):
+                    fpaths.add(fpath)
+            # don't wait forever on a continuous stream of events
+            if time.monotonic() - started_on > self.watch_debounce * 10:
+                break
+            events = inotify.read_events(self.watch_debounce)
+        return fpaths, rescan
+
+    def record_exposed(self, aliases: set[str]):
+        """record exposed books of aliases to previous_lib (as written library)
+
+        So next changes (watch) compare to this library"""
+        for alias in aliases:
+            self.previous_lib.replace(
+                alias,
+                (
+                    to_book_element(self.all_zims[alias][0]).attrib
+                    if alias in self.all_zims
+                    else None
+                ),
+            )
 
+    def watch(self):
+        """update outputs for ZIM files changes, as they happen (never returns)
 
-def entrypoint():
+        Changes are received from inotify and only affected aliases are re-read.
+        A full rescan is done every watch_rescan_interval or when events are
+        unreliable (queue overflow, folder changes)"""
+        inotify = Inotify()
+        try:
+            inotify.add_tree(self.zim_root, with_hidden=self.with_hidden)
+            logger.info(f"[WATCH] Watching {len(inotify.watches)} folders")
+            rescan, fpaths = True, set()
+            scanned_on = time.monotonic()
+            while True:
+                self.metrics = RunMetrics()
+                succeeded = False
+                try:
+                    if rescan:
+                        logger.info(f"[WATCH] Full scan of {self.zim_root}")
+                        with self.metrics.phase("load_previous_library"):
+                            self.load_previous_library()
+                        self.all_zims = {}
+                        self.updated_zims = {}
+                        with self.metrics.phase("readfs"):
+                            self.readfs()
+                        scanned_on = time.monotonic()
+                        aliases = set(self.all_zims.keys())
+                    else:
+                        logger.info(f"[WATCH] {len(fpaths)} ZIM files changed")
+                        with self.metrics.phase("readfs"):
+                            aliases = self.refresh_zim_files(fpaths)
+                    self.apply_actions()
+                    self.record_exposed(aliases)
+                    succeeded = True
+                except Exception as exc:
+                    logger.exception(f"[WATCH] Failed to apply changes: {exc}")
+                self.write_metrics(succeeded=succeeded)
+
+                fpaths, rescan = self.wait_for_changes(
+                    inotify,
+                    max(scanned_on + self.watch_rescan_interval - time.monotonic(), 0),
+                )
+                rescan = rescan or (
+                    time.monotonic() >= scanned_on + self.watch_rescan_interval
+                )
+        finally:
+            inotify.close()
+
+
+def get_parser() -> argparse.ArgumentParser:
     parser = argparse.ArgumentParser(
         prog="library-maint",
         description="Library ZIM and XML maintenance script",
@@ -888,6 +3479,8 @@ def entrypoint():
         "actions",
         help="Actions to perform. Comma-separated list within: "
         f"{LibraryMaintainer.ACTIONS}. “all” shortcut runs them all. "
+        "“watch” keeps running, performing other actions (or "
+        f"{LibraryMaintainer.WATCH_ACTIONS}) on ZIM files changes. "
         "Defaults to `LIBRARY_MAINT_ACTION` environ or {Defaults.LIBRARY_MAINT_ACTION}",
         nargs="+",
         default=os.getenv("LIBRARY_MAINT_ACTION", Defaults.LIBRARY_MAINT_ACTION),
@@ -981,6 +3574,85 @@ def entrypoint():
         dest="varnish_urls",
     )
 
+    parser.add_argument(
+        "--varnish-purge-concurrency",
+        default=os.getenv(
+            "VARNISH_PURGE_CONCURRENCY", Defaults.VARNISH_PURGE_CONCURRENCY
+        ),
+        help="Max nb. of concurrent PURGE requests (all varnish URLs). Defaults to "
+        f"`VARNISH_PURGE_CONCURRENCY` environ or {Defaults.VARNISH_PURGE_CONCURRENCY}",
+        type=int,
+        dest="varnish_purge_concurrency",
+    )
+
+    parser.add_argument(
+        "--varnish-purge-batch-size",
+        default=os.getenv(
+            "VARNISH_PURGE_BATCH_SIZE", Defaults.VARNISH_PURGE_BATCH_SIZE
+        ),
+        help="Nb. of Books to purge per PURGE request (`books` purge type). "
+        "0 or 1 purges Books one by one (`book` purge type). Defaults to "
+        f"`VARNISH_PURGE_BATCH_SIZE` environ or {Defaults.VARNISH_PURGE_BATCH_SIZE}",
+        type=int,
+        dest="varnish_purge_batch_size",
+    )
+
+    parser.add_argument(
+        "--library-compressions",
+        help="Comma-separated compressed variants to write next to the Public "
+        "Library and OPDS catalog (for nginx gzip_static/brotli_static) within: "
+        f"{','.join(LIBRARY_COMPRESSION_MODULES.keys())}. br and zst are skipped "
+        "if their module is not installed. Others are removed. "
+        "Defaults to `LIBRARY_COMPRESSIONS` environ. Disabled if empty.",
+        default=os.getenv("LIBRARY_COMPRESSIONS", Defaults.LIBRARY_COMPRESSIONS),
+        dest="library_compressions",
+    )
+
+    parser.add_argument(
+        "--library-shards",
+        help="Comma-separated kinds of Internal Library shards (sub-libraries) to "
+        f"write along libraries, within: {','.join(LIBRARY_SHARD_KINDS)}. "
+        "Defaults to `LIBRARY_SHARDS` environ. Disabled if empty.",
+        default=os.getenv("LIBRARY_SHARDS", ""),
+        dest="library_shards",
+    )
+
+    parser.add_argument(
+        "--library-shards-dest",
+        help="Folder to write Internal Library shards and their manifest to. "
+        "Defaults to `LIBRARY_SHARDS_PATH` environ or a `shards` folder next to "
+        "the Internal Library",
+        default=os.getenv("LIBRARY_SHARDS_PATH", ""),
+        dest="library_shards_dest",
+    )
+
+    parser.add_argument(
+        "--opds-dest",
+        help="Folder to write a static OPDS v2 catalog (as kiwix-serve's "
+        "/catalog/v2 documents) to, along libraries. "
+        "Defaults to `OPDS_PATH` environ. Disabled if empty.",
+        default=os.getenv("OPDS_PATH", ""),
+        dest="opds_dest",
+    )
+
+    parser.add_argument(
+        "--opds-root-url",
+        help="URL-prefix of kiwix-serve (/catalog and /content) for links in the "
+        "static OPDS catalog. Defaults to `OPDS_ROOT_URL` environ (empty: "
+        "absolute paths)",
+        default=os.getenv("OPDS_ROOT_URL", ""),
+        dest="opds_root_url",
+    )
+
+    parser.add_argument(
+        "--opds-page-size",
+        help="Nb. of entries per page of static OPDS catalog entries. "
+        f"Defaults to {Defaults.OPDS_PAGE_SIZE}",
+        default=Defaults.OPDS_PAGE_SIZE,
+        type=int,
+        dest="opds_page_size",
+    )
+
     parser.add_argument(
         "--log-to",
         help="Save log output to to file in addition to stdout",
@@ -990,19 +3662,164 @@ def entrypoint():
 
     parser.add_argument(
         "--dump-fs",
-        help="Dump filesystem-read info to a JSON file",
+        help="Dump filesystem-read info to a binary snapshot file "
+        "(JSON if path ends with .json)",
         default="",
         dest="dump_fs",
     )
 
     parser.add_argument(
         "--load-fs",
-        help="Read filesystem-read info from a JSON file (if it exists).",
+        help="Read filesystem-read info from a snapshot or JSON file (if it exists).",
         default="",
         dest="load_fs",
     )
 
+    parser.add_argument(
+        "--revalidate",
+        help="With --load-fs, walk ZIM_ROOT anyway and only read ZIM files whose "
+        "size or mtime changed since the snapshot",
+        default=False,
+        action="store_true",
+        dest="revalidate",
+    )
+
+    parser.add_argument(
+        "--fs-fingerprint",
+        help="Path to a file recording a fingerprint of ZIM_ROOT folders (mtimes, "
+        "nb. of entries) after a complete run. Next runs exit early if unchanged. "
+        "Defaults to `FS_FINGERPRINT_PATH` environ. Disabled if empty.",
+        default=os.getenv("FS_FINGERPRINT_PATH", ""),
+        dest="fs_fingerprint",
+    )
+
+    parser.add_argument(
+        "--zim-cache",
+        help="Path to an SQLite file caching in-ZIM info between runs so only new "
+        "or modified ZIMs are opened. Defaults to `ZIM_CACHE_PATH` environ. "
+        "Disabled if empty.",
+        default=os.getenv("ZIM_CACHE_PATH", ""),
+        dest="zim_cache",
+    )
+
+    parser.add_argument(
+        "--workers",
+        help="Nb. of processes to read ZIM files with (in-ZIM info). "
+        "Defaults to `NB_WORKERS` environ or 1 (no parallelism)",
+        default=os.getenv("NB_WORKERS", "1"),
+        type=int,
+        dest="workers",
+    )
+
+    parser.add_argument(
+        "--mirrorbrain-hashed",
+        help="Path to a file recording paths known to have hashes on Mirrorbrain "
+        "so they are not queried again on next runs. "
+        "Defaults to `MIRRORBRAIN_HASHED_PATH` environ. Disabled if empty.",
+        default=os.getenv("MIRRORBRAIN_HASHED_PATH", ""),
+        dest="mirrorbrain_hashed",
+    )
+
+    parser.add_argument(
+        "--metrics-textfile",
+        help="Path to write per-phase durations and counters of the run to, "
+        "in Prometheus text format (for node-exporter's textfile collector). "
+        "Defaults to `METRICS_TEXTFILE` environ. Disabled if empty.",
+        default=os.getenv("METRICS_TEXTFILE", ""),
+        dest="metrics_textfile",
+    )
+
+    parser.add_argument(
+        "--metrics-json",
+        help="Path to write per-phase durations and counters of the run to, as JSON",
+        default="",
+        dest="metrics_json",
+    )
+
+    parser.add_argument(
+        "--watch-debounce",
+        help="Nb. of seconds without ZIM files changes before applying them "
+        "(watch). Defaults to `WATCH_DEBOUNCE` environ or "
+        f"{Defaults.WATCH_DEBOUNCE}",
+        default=os.getenv("WATCH_DEBOUNCE", str(Defaults.WATCH_DEBOUNCE)),
+        type=float,
+        dest="watch_debounce",
+    )
+
+    parser.add_argument(
+        "--watch-rescan-interval",
+        help="Nb. of seconds between full scans of ZIM_ROOT (watch). "
+        "Defaults to `WATCH_RESCAN_INTERVAL` environ or "
+        f"{Defaults.WATCH_RESCAN_INTERVAL}",
+        default=os.getenv("WATCH_RESCAN_INTERVAL", str(Defaults.WATCH_RESCAN_INTERVAL)),
+        type=float,
+        dest="watch_rescan_interval",
+    )
+
+    parser.add_argument(
+        "--zim-trash",
+        help="Folder to move obsolete ZIM files to (delete-zim) instead of removing "
+        "them. Must be on ZIM_ROOT's filesystem (and hidden if within it). Files "
+        "are then reclaimed in the background, without blocking other actions. "
+        "Defaults to `ZIM_TRASH_PATH` environ. Disabled if empty.",
+        default=os.getenv("ZIM_TRASH_PATH", ""),
+        dest="zim_trash",
+    )
+
+    parser.add_argument(
+        "--trash-reclaim-rate",
+        help="Max. nb. of bytes per second to reclaim from ZIM trash (0 for "
+        f"unlimited). Defaults to {Defaults.TRASH_RECLAIM_RATE}",
+        default=Defaults.TRASH_RECLAIM_RATE,
+        type=int,
+        dest="trash_reclaim_rate",
+    )
+
+    parser.add_argument(
+        "--trash-truncate-step",
+        help="Nb. of bytes to truncate ZIM files in trash by at once, before "
+        "removing them (0 to remove at once). Defaults to "
+        f"{Defaults.TRASH_TRUNCATE_STEP}",
+        default=Defaults.TRASH_TRUNCATE_STEP,
+        type=int,
+        dest="trash_truncate_step",
+    )
+
+    parser.add_argument(
+        "--library-journal",
+        help="Path to append Public Library changes (added, updated and removed "
+        "books) to, as sequence-numbered JSON lines. Defaults to "
+        "`LIBRARY_JOURNAL_PATH` environ. Disabled if empty.",
+        default=os.getenv("LIBRARY_JOURNAL_PATH", ""),
+        dest="library_journal",
+    )
+
+    parser.add_argument(
+        "--library-journal-max-size",
+        help="Nb. of bytes after which library journal is rotated. Defaults to "
+        f"{Defaults.LIBRARY_JOURNAL_MAX_SIZE}",
+        default=Defaults.LIBRARY_JOURNAL_MAX_SIZE,
+        type=int,
+        dest="library_journal_max_size",
+    )
+
+    parser.add_argument(
+        "--library-journal-keep",
+        help="Nb. of rotated library journal files to keep. Defaults to "
+        f"{Defaults.LIBRARY_JOURNAL_KEEP}",
+        default=Defaults.LIBRARY_JOURNAL_KEEP,
+        type=int,
+        dest="library_journal_keep",
+    )
+
+    return parser
+
+
+def entrypoint():
+    parser = get_parser()
     args = parser.parse_args()
+    if args.revalidate and not args.load_fs:
+        parser.error("--revalidate requires --load-fs")
 
     # enable log to file
     handlers = [logging.StreamHandler()]
@@ -0,0 +1,321 @@
+"""Tests for library-maint.py
+
+pytest zim/library-mgmt/test_library_maint.py
+"""
+
+import importlib.util
+import json
+import pathlib
+
+import pytest
+
+spec = importlib.util.spec_from_file_location(
+    "library_maint", pathlib.Path(__file__).with_name("library-maint.py")
+)
+library_maint = importlib.util.module_from_spec(spec)  # pyright: ignore
+spec.loader.exec_module(library_maint)  # pyright: ignore
+
+
+def fake_zim_metadata(fpath: pathlib.Path) -> dict[str, str]:
+    return {
+        "id": f"id-{fpath.stem}",
+        "title": fpath.stem,
+        "language": "eng",
+        "name": fpath.stem.rsplit("_", 1)[0],
+        "tags": "_category:wikipedia",
+        "mediaCount": "1",
+        "articleCount": "1",
+    }
+
+
+@pytest.fixture
+def maintainer(tmp_path, monkeypatch):
+    """LibraryMaintainer factory on tmp_path, with fake in-ZIM info"""
+    monkeypatch.setattr(library_maint, "read_zim_metadata", fake_zim_metadata)
+    (tmp_path / "zim" / "wikipedia").mkdir(parents=True)
+    (tmp_path / "library").mkdir()
+
+    def factory(*extra_args: str):
+        args = library_maint.get_parser().parse_args(
+            [
+                "write-libraries",
+                "--zim-root",
+                str(tmp_path / "zim"),
+                "--library-dest",
+                str(tmp_path / "library" / "library_zim.xml"),
+                "--internal-library-dest",
+                str(tmp_path / "library" / "internal_library.xml"),
+                "--library-journal",
+                str(tmp_path / "library" / "journal.jsonl"),
+                "--library-compressions",
+                "",
+                "--workers",
+                "1",
+                *extra_args,
+            ]
+        )
+        return library_maint.LibraryMaintainer(**dict(args._get_kwargs()))
+
+    return factory
+
+
+def test_fingerprint_skip_requires_all_outputs(tmp_path, maintainer):
+    (tmp_path / "zim" / "wikipedia" / "wikipedia_en_all_maxi_2024-05.zim").write_bytes(
+        b"x" * 1024
+    )
+    opds = tmp_path / "library" / "opds"
+    args = ("--opds-dest", str(opds), "--fs-fingerprint", str(tmp_path / "fp"))
+    # second run journals (against first one's library)
+    for _ in range(2):
+        maint = maintainer(*args)
+        maint.load_previous_library()
+        maint.readfs()
+        maint.write_libraries()
+        maint.save_fingerprint("fingerprint")
+    assert maint.is_unchanged_since_last_run("fingerprint")
+    assert not maint.is_unchanged_since_last_run("other")
+
+    (opds / "root.xml").unlink()
+    assert not maint.is_unchanged_since_last_run("fingerprint")
+    maint.write_libraries()
+    assert maint.is_unchanged_since_last_run("fingerprint")
+
+    (tmp_path / "library" / "journal.jsonl").unlink()
+    assert not maint.is_unchanged_since_last_run("fingerprint")
+
+
+def test_revalidate_requires_load_fs(monkeypatch, capsys):
+    monkeypatch.setattr("sys.argv", ["library-maint", "--revalidate", "read"])
+    with pytest.raises(SystemExit) as exc_info:
+        library_maint.entrypoint()
+    assert exc_info.value.code == 2  # noqa: PLR2004
+    assert "--revalidate requires --load-fs" in capsys.readouterr().err
+
+
+def test_zim_trash_on_other_filesystem(tmp_path, maintainer):
+    # missing trash on the same filesystem is fine
+    maintainer("--zim-trash", str(tmp_path / "trash" / "zim"))
+
+    other = pathlib.Path("/dev/shm")  # noqa: S108
+    if not other.is_dir() or other.stat().st_dev == tmp_path.stat().st_dev:
+        pytest.skip("no other filesystem to test with")
+    with pytest.raises(ValueError, match="filesystem"):
+        maintainer("--zim-trash", str(other / "trash"))
+
+
+def create_zim(fpath: pathlib.Path, metadata: dict[str, str]):
+    """small ZIM with a single front article and metadata"""
+    writer = pytest.importorskip("libzim.writer")
+
+    class Article(writer.Item):
+        def get_path(self):
+            return "index"
+
+        def get_title(self):
+            return "Index"
+
+        def get_mimetype(self):
+            return "text/html"
+
+        def get_contentprovider(self):
+            return writer.StringProvider("<html><body>Index</body></html>")
+
+        def get_hints(self):
+            return {writer.Hint.FRONT_ARTICLE: True}
+
+    with writer.Creator(fpath).config_indexing(False, "eng") as creator:
+        creator.set_mainpath("index")
+        for name, value in metadata.items():
+            creator.add_metadata(name, value)
+        creator.add_item(Article())
+
+
+@pytest.mark.parametrize(
+    "tags", [None, "", "_category:wikipedia;_pictures:no"], ids=["none", "empty", "set"]
+)
+def test_header_reader_matches_archive(tmp_path, monkeypatch, tags):
+    fpath = tmp_path / "wikipedia_en_all_maxi_2024-05.zim"
+    metadata = {
+        "Title": "Wikipedia",
+        "Description": "Test ZIM",
+        "Language": "eng",
+        "Creator": "Kiwix",
+        "Publisher": "Kiwix",
+        "Name": "wikipedia_en_all",
+        "Date": "2024-05-01",
+    }
+    if tags is not None:
+        metadata["Tags"] = tags
+    create_zim(fpath, metadata)
+
+    with library_maint.ZimHeaderReader(fpath) as reader:
+        header_info = reader.get_info(fpath)
+
+    class UnreadableZim(library_maint.ZimHeaderReader):
+        def __enter__(self):
+            raise ValueError("read with Archive")
+
+    monkeypatch.setattr(library_maint, "ZimHeaderReader", UnreadableZim)
+    assert header_info == library_maint.read_zim_metadata(fpath)
+    assert "tags" in header_info
+
+
+def test_watch_rollback_is_update(tmp_path, maintainer):
+    folder = tmp_path / "zim" / "wikipedia"
+    (folder / "wikipedia_en_all_maxi_2024-05.zim").write_bytes(b"x" * 1024)
+
+    # library from a previous (cron) run
+    maint = maintainer()
+    maint.load_previous_library()
+    maint.readfs()
+    maint.write_libraries()
+
+    # watch: initial scan then new version then its removal
+    maint = maintainer()
+    maint.load_previous_library()
+    maint.readfs()
+    maint.write_libraries()
+    maint.record_exposed(set(maint.all_zims.keys()))
+
+    latest = folder / "wikipedia_en_all_maxi_2024-06.zim"
+    latest.write_bytes(b"x" * 2048)
+    aliases = maint.refresh_zim_files({latest})
+    assert maint.updated_zims == {
+        "wikipedia_en_all_maxi": (
+            "id-wikipedia_en_all_maxi_2024-06",
+            "wikipedia_en_all_maxi_2024-06",
+        )
+    }
+    maint.write_libraries()
+    maint.record_exposed(aliases)
+
+    latest.with_suffix(".delete").touch()
+    aliases = maint.refresh_zim_files({latest.with_suffix(".delete")})
+    assert maint.updated_zims == {
+        "wikipedia_en_all_maxi": (
+            "id-wikipedia_en_all_maxi_2024-05",
+            "wikipedia_en_all_maxi_2024-05",
+        )
+    }
+    maint.write_libraries()
+    maint.record_exposed(aliases)
+
+    events = [
+        (event["event"], event["core"])
+        for event in map(
+            json.loads,
+            (tmp_path / "library" / "journal.jsonl").read_text().splitlines(),
+        )
+    ]
+    assert events == [
+        ("updated", "wikipedia_en_all_maxi_2024-06"),
+        ("updated", "wikipedia_en_all_maxi_2024-05"),
+    ]
+
+
+def test_library_index_checks_digest(tmp_path):
+    fpath = tmp_path / "library.xml"
+
+    def write(book_id: str):
+        with library_maint.write_library(fpath) as writer:
+            writer.add_book(
+                library_maint.etree.Element(
+                    "book",
+                    id=book_id,
+                    url="https://x/wikipedia/wikipedia_en_all_maxi_2024-05.zim.meta4",
+                )
+            )
+
+    write("aaaa")
+    with library_maint.LibraryIndex(fpath) as index:
+        assert index.get_book("alias", "wikipedia_en_all_maxi").get("id") == "aaaa"
+    previous_index = fpath.with_name("library.xml.idx").read_bytes()
+
+    # same size library, indexed by a previous index
+    write("bbbb")
+    fpath.with_name("library.xml.idx").write_bytes(previous_index)
+    with pytest.raises(ValueError, match="stale"):
+        library_maint.LibraryIndex(fpath)
+
+
+# /catalog/v2/entries?lang=eng entry from kiwix-serve (libkiwix catalog_v2_entry.xml)
+# serving a library with the book below
+KIWIX_SERVE_OPDS_ENTRY = """<feed xmlns="http://www.w3.org/2005/Atom"
+      xmlns:dc="http://purl.org/dc/terms/">
+  <entry>
+    <id>urn:uuid:7d4e5a4b-16d4-4a5d-a6b4-8ea8e3ce1a87</id>
+    <title>Wikipedia</title>
+    <updated>2024-05-01T00:00:00Z</updated>
+    <summary>The best of Wikipedia</summary>
+    <language>eng</language>
+    <name>wikipedia_en_all</name>
+    <flavour>maxi</flavour>
+    <category>wikipedia</category>
+    <tags>wikipedia;_category:wikipedia;_pictures:yes;_videos:no;_details:yes</tags>
+    <articleCount>6805730</articleCount>
+    <mediaCount>5743640</mediaCount>
+    <link rel="http://opds-spec.org/image/thumbnail"
+          href="/catalog/v2/illustration/7d4e5a4b-16d4-4a5d-a6b4-8ea8e3ce1a87/?size=48"
+          type="image/png;width=48;height=48;scale=1"/>
+    <link type="text/html" href="/content/wikipedia_en_all_maxi_2024-05" />
+    <author>
+      <name>Wikipedia</name>
+    </author>
+    <publisher>
+      <name>Kiwix</name>
+    </publisher>
+    <dc:issued>2024-05-01T00:00:00Z</dc:issued>
+    <link rel="http://opds-spec.org/acquisition/open-access" type="application/x-zim"
+          href="https://download.kiwix.org/zim/wikipedia/wikipedia_en_all_maxi_2024-05.zim.meta4"
+          length="116890152960" />
+  </entry>
+</feed>"""
+
+
+def test_opds_entry_matches_kiwix_serve(tmp_path):
+    relpath = pathlib.Path("wikipedia/wikipedia_en_all_maxi_2024-05.zim")
+    entry = library_maint.ZimEntry(
+        project="wikipedia",
+        lang="en",
+        option="all_maxi",
+        month="05",
+        year="2024",
+        core=relpath.stem,
+        # library size is in KiB
+        rsize=116890152960 + 1000,
+        relpath=relpath,
+        url=f"https://download.kiwix.org/zim/{relpath}.meta4",
+        latest=True,
+    )
+    entry.update(
+        {
+            "id": "7d4e5a4b-16d4-4a5d-a6b4-8ea8e3ce1a87",
+            "title": "Wikipedia",
+            "description": "The best of Wikipedia",
+            "language": "eng",
+            "name": "wikipedia_en_all",
+            "flavour": "maxi",
+            "tags": "wikipedia;_category:wikipedia;_pictures:yes;_videos:no;"
+            "_details:yes",
+            "articleCount": "6805730",
+            "mediaCount": "5743640",
+            "creator": "Wikipedia",
+            "publisher": "Kiwix",
+            "date": "2024-05-01",
+            "favicon": "iVBORw0KGgo=",
+        }
+    )
+    writer = library_maint.OpdsCatalogWriter(tmp_path, root_url="", page_size=10)
+    writer.write_catalog([entry])
+
+    def to_items(elem):
+        return [
+            (child.tag, sorted(child.attrib.items()), (child.text or "").strip())
+            for child in elem.iter()
+        ]
+
+    expected = library_maint.etree.fromstring(KIWIX_SERVE_OPDS_ENTRY.encode())
+    written = library_maint.etree.parse(str(tmp_path / "entries" / "lang" / "eng.xml"))
+    assert to_items(written.find("{http://www.w3.org/2005/Atom}entry")) == to_items(
+        expected.find("{http://www.w3.org/2005/Atom}entry")
+    )